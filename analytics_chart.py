@@ -0,0 +1,50 @@
+import base64
+import io
+import threading
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+
+# Analytics chart for the admin page: the symptom co-occurrence heatmap
+# next to the symptom x diagnosis lift table, both from
+# cooccurrence.Tables. Like PieChartRenderer it keeps one Figure and one
+# Agg canvas and redraws them in place, so render_png() can run on the
+# task worker every time new records come in.
+
+class AnalyticsRenderer:
+    def __init__(self, size=(11, 6), dpi=90):
+        self.figure = Figure(figsize=size, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self._lock = threading.Lock()
+
+    def render_png(self, tables, codes, diagnoses):
+        # base64 PNG, ready for tk.PhotoImage(data=...)
+        with self._lock:
+            self.figure.clear()
+            pairs_ax, lift_ax = self.figure.subplots(1, 2, gridspec_kw={"width_ratios": [3, 1.4]})
+
+            # share of all records that have both symptoms
+            share = tables.pairs / max(tables.total, 1) * 100
+            image = pairs_ax.imshow(share, cmap="Blues")
+            pairs_ax.set_xticks(range(len(codes)), codes, rotation=90, fontsize=8)
+            pairs_ax.set_yticks(range(len(codes)), codes, fontsize=8)
+            pairs_ax.set_title(f"Symptom co-occurrence (% of {tables.total} records)", fontsize=10)
+            self.figure.colorbar(image, ax=pairs_ax, shrink=0.8)
+
+            # log scale so 0.5x and 2x are the same distance from 1
+            lift = np.ma.masked_invalid(tables.lift)
+            lift_ax.imshow(lift, cmap="RdBu_r", norm=LogNorm(vmin=0.1, vmax=10), aspect="auto")
+            for (row, col), value in np.ndenumerate(tables.lift):
+                text = "-" if np.isnan(value) else f"{value:.2f}"
+                dark = not np.isnan(value) and (value > 4 or value < 0.25)
+                lift_ax.text(col, row, text, ha="center", va="center", fontsize=7,
+                             color="white" if dark else "black")
+            lift_ax.set_xticks(range(len(diagnoses)), diagnoses, fontsize=8)
+            lift_ax.set_yticks(range(len(codes)), codes, fontsize=8)
+            lift_ax.set_title("Lift: symptom x diagnosis", fontsize=10)
+
+            self.figure.tight_layout()
+            buf = io.BytesIO()
+            self.canvas.print_png(buf)
+            return base64.b64encode(buf.getvalue()).decode("ascii")
@@ -0,0 +1,128 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from records import SEPARATOR, Record, TextRecordLog, format_record, read_records
+from segmented_log import SegmentedRecordLog
+
+SEGMENT_BYTES = 20000   # small, so segments are closed while writers append
+
+# Multi-process stress test for appends to the text record log (or the
+# segmented log, with --segmented). For each
+# writer count, that many processes append to one fresh log at the same
+# time, one record per append as the app does. The log is then read back
+# and every record checked against what was written: nothing lost,
+# duplicated or corrupted. Finally a torn record is planted (a writer
+# dying mid-write) to check that readers skip it and still read the next
+# record.
+#
+#   python append_stress.py                          # 1, 2, 4, 8 writers
+#   python append_stress.py --writers 1 16 --appends 5000
+#   python append_stress.py --naive                  # the old four-write append
+#   python append_stress.py --segmented              # a segmented log that
+#                                                    # rolls over every 20 KB
+#
+# Exits 1 if any run reads back something other than what was written.
+
+CODES = ("G001", "G002", "G004", "G005", "G007", "G008", "G009", "G011",
+         "G012", "G014", "G015", "G017", "G018", "G020", "G021")
+DIAGNOSES = ("None", "P001", "P002", "P003")
+
+def make_record(writer, i):
+    # distinct per (writer, i), so a record garbled or mixed up with
+    # another one cannot pass for a good one
+    symptoms = tuple(code for bit, code in enumerate(CODES) if (i * 7 + writer) >> bit & 1)
+    date = f"2026-{writer % 12 + 1:02d}-{i % 28 + 1:02d} {writer % 24:02d}:{i // 3600 % 60:02d}:{i % 60:02d}"
+    return Record(date, symptoms, DIAGNOSES[(writer + i) % len(DIAGNOSES)])
+
+def naive_append(path, record):
+    # what save_diagnosis_to_file did: one write per line
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(SEPARATOR + "\n")
+        f.flush()
+        f.write(f"Date: {record.date}\n")
+        f.flush()
+        f.write(f"Selected Symptoms: {', '.join(record.symptoms) or '-'}\n")
+        f.flush()
+        f.write(f"Diagnosis Result: {record.diagnosis}\n")
+
+def open_log(path, segmented):
+    if segmented:
+        return SegmentedRecordLog(path, max_bytes=SEGMENT_BYTES, roll=None)
+    return TextRecordLog(path)
+
+def writer_process(path, writer, appends, naive, segmented, start):
+    log = open_log(path, segmented)
+    start.wait()
+    for i in range(appends):
+        record = make_record(writer, i)
+        if naive:
+            naive_append(path, record)
+        else:
+            log.append(record)
+    log.close()
+
+def run(path, writers, appends, naive, segmented):
+    # (appends per second, records read back, corrupted or missing records)
+    start = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=writer_process, args=(path, writer, appends, naive, segmented, start))
+        for writer in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    began = time.perf_counter()
+    start.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - began
+
+    expected = Counter(make_record(writer, i) for writer in range(writers) for i in range(appends))
+    log = open_log(path, segmented)
+    found = Counter(log.records())
+    log.close()
+    bad = sum(((expected - found) + (found - expected)).values())
+    return writers * appends / elapsed, sum(found.values()), bad
+
+def torn_tail_check(path):
+    # a record cut off mid-line, then a normal append after it
+    log = TextRecordLog(path)
+    log.append(make_record(0, 0))
+    torn = format_record(make_record(0, 1)).encode("utf-8")
+    with open(path, "ab") as f:
+        f.write(torn[:len(torn) - 3])
+    log.append(make_record(0, 2))
+    log.close()
+    found = [record for record, _ in read_records(path)]
+    return found == [make_record(0, 0), make_record(0, 2)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent appends to one text record log.")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--appends", type=int, default=2000, help="appends per writer")
+    parser.add_argument("--naive", action="store_true", help="append with one write per line instead")
+    parser.add_argument("--segmented", action="store_true",
+                        help=f"append to a segmented log rolling over every {SEGMENT_BYTES} bytes")
+    args = parser.parse_args(argv)
+    if args.naive and args.segmented:
+        parser.error("--naive only applies to the text log")
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'writers':>8s} {'appends/s':>12s} {'records':>9s} {'corrupted':>10s}")
+        for writers in args.writers:
+            path = os.path.join(workdir, f"stress{writers}" + (".segments" if args.segmented else ".txt"))
+            rate, records, bad = run(path, writers, args.appends, args.naive, args.segmented)
+            failed = failed or bad > 0
+            print(f"{writers:8d} {rate:12,.0f} {records:9d} {bad:10d}")
+
+        torn_ok = torn_tail_check(os.path.join(workdir, "torn.txt"))
+        failed = failed or not torn_ok
+        print(f"torn record skipped: {'yes' if torn_ok else 'NO'}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
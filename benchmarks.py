@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+import bitset_engine
+import engine
+import rule_table
+from generate_records import generate, write_records
+from record_store import SqliteRecordStore
+from records import TextRecordLog, read_records
+
+# Benchmarks for the hot paths, on synthetic records from
+# generate_records.py.
+#
+#   python benchmarks.py                      # everything, 100k records
+#   python benchmarks.py --records 1000000 -o bench.json
+#   python benchmarks.py inference parse --compare bench.json
+#
+# Every benchmark reports its operation count, the best wall time over
+# --repeat runs and the rate. The JSON file also records the commit and
+# interpreter, so files from different commits can be compared with
+# --compare.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def timed(func, repeat):
+    # best of `repeat` runs, in seconds
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def result(ops, seconds, unit):
+    return {
+        "ops": ops,
+        "seconds": round(seconds, 6),
+        "rate": round(ops / seconds, 1) if seconds else None,
+        "unit": unit,
+        "us_per_op": round(seconds / ops * 1e6, 3) if ops else None
+    }
+
+class Workload:
+    # synthetic records, plus a text log of the first log_count of them
+    def __init__(self, count, log_count, seed, workdir):
+        self.records = list(generate(count, seed=seed))
+        self.log_count = log_count
+        self.log_path = os.path.join(workdir, "records.txt")
+        with open(self.log_path, "w", encoding="utf-8", newline="\n") as f:
+            write_records(f, self.records[:log_count])
+        self.workdir = workdir
+        self._files = 0
+
+    def new_path(self, suffix):
+        self._files += 1
+        return os.path.join(self.workdir, f"bench{self._files}{suffix}")
+
+def bench_inference(work, args):
+    # one diagnosis per call through the shared CLIPS environment, the
+    # pure-Python bitset engine and the precompiled table; the CLIPS run
+    # is left out under ALZ_ENGINE=bitset
+    symptom_sets = [record.symptoms for record in islice(work.records, args.inference)]
+    engine.diagnose(())
+    bitset_engine.current()
+    rule_table.load_table()
+
+    def clips():
+        for symptoms in symptom_sets:
+            engine.diagnose(symptoms)
+
+    def bitset():
+        for symptoms in symptom_sets:
+            bitset_engine.diagnose(symptoms)
+
+    def table():
+        for symptoms in symptom_sets:
+            rule_table.diagnose_fast(symptoms)
+
+    results = {}
+    if engine.BACKEND == "clips":
+        results["clips"] = result(len(symptom_sets), timed(clips, args.repeat), "diagnoses/s")
+    results.update({
+        "bitset": result(len(symptom_sets), timed(bitset, args.repeat), "diagnoses/s"),
+        "table": result(len(symptom_sets), timed(table, args.repeat), "diagnoses/s")
+    })
+    return results
+
+def bench_append(work, args):
+    # appends one record per call (the app's save path) and in batches of
+    # 500 (the background writer), without fsync
+    records = work.records[:args.appends]
+    results = {}
+    for name, store_class, suffix in (("text", TextRecordLog, ".txt"),
+                                      ("sqlite", SqliteRecordStore, ".db")):
+        def single():
+            store = store_class(work.new_path(suffix))
+            for record in records:
+                store.append(record)
+            store.close()
+
+        def batched():
+            store = store_class(work.new_path(suffix))
+            for i in range(0, len(records), 500):
+                store.append_many(records[i:i + 500])
+            store.close()
+
+        results[name + "_single"] = result(len(records), timed(single, args.repeat), "records/s")
+        results[name + "_batch500"] = result(len(records), timed(batched, args.repeat), "records/s")
+    return results
+
+def bench_parse(work, args):
+    # full read of the text log into a list, as the admin page did before
+    # it was paged
+    def parse():
+        rows = [record for record, _ in read_records(work.log_path)]
+        assert len(rows) == work.log_count
+
+    size = os.path.getsize(work.log_path)
+    parsed = result(work.log_count, timed(parse, args.repeat), "records/s")
+    parsed["mb_per_s"] = round(size / 1e6 / parsed["seconds"], 1)
+    return {"text_full": parsed}
+
+def bench_aggregate(work, args):
+    # diagnosis counts for the pie chart: a full scan, the text log's
+    # counts sidecar (cold = built from scratch, warm = already current)
+    # and the SQLite count table
+    count = work.log_count
+    queries = 1000
+
+    def scan():
+        Counter(record.diagnosis for record, _ in read_records(work.log_path))
+
+    def sidecar_cold():
+        sidecar = work.log_path + ".counts.json"
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+        TextRecordLog(work.log_path).diagnosis_counts()
+
+    results = {
+        "scan": result(count, timed(scan, args.repeat), "records/s"),
+        "sidecar_cold": result(count, timed(sidecar_cold, args.repeat), "records/s")
+    }
+
+    warm_log = TextRecordLog(work.log_path)
+    warm_log.diagnosis_counts()
+    store = SqliteRecordStore(work.new_path(".db"))
+    store.append_many(work.records[:count])
+
+    def warm():
+        for _ in range(queries):
+            warm_log.diagnosis_counts()
+
+    def sqlite():
+        for _ in range(queries):
+            store.diagnosis_counts()
+
+    results.update({
+        "sidecar_warm": result(queries, timed(warm, args.repeat), "queries/s"),
+        "sqlite": result(queries, timed(sqlite, args.repeat), "queries/s")
+    })
+    store.close()
+    return results
+
+def bench_analytics(work, args):
+    # co-occurrence and lift for the analytics page: the histogram built
+    # from the whole log (cold), 1000 appended records folded in
+    # (incremental), and the tables computed from the histogram
+    from cooccurrence import CooccurrenceStats, tables_from_histogram
+    added = 1000
+    queries = 100
+
+    def cold():
+        sidecar = work.log_path + ".cooc"
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+        CooccurrenceStats(TextRecordLog(work.log_path)).refresh()
+
+    log = TextRecordLog(work.new_path(".txt"))
+    log.append_many(work.records[:work.log_count])
+    log.sync()
+    stats = CooccurrenceStats(log)
+    stats.refresh()
+
+    def incremental():
+        log.append_many(work.records[:added])
+        log.sync()
+        stats.refresh()
+
+    def tables():
+        for _ in range(queries):
+            tables_from_histogram(stats.histogram)
+
+    results = {
+        "cold": result(work.log_count, timed(cold, args.repeat), "records/s"),
+        "incremental": result(added, timed(incremental, args.repeat), "records/s"),
+        "tables": result(queries, timed(tables, args.repeat), "queries/s")
+    }
+    log.close()
+    return results
+
+def bench_segments(work, args):
+    # the segmented log: appends in batches of 500 (including closing and
+    # compressing segments), diagnosis counts from the segment summaries,
+    # and one month read back through read_range
+    from segmented_log import SegmentedRecordLog, disk_usage
+    count = work.log_count
+    queries = 1000
+    rows = work.records[:count]
+
+    def append():
+        log = SegmentedRecordLog(work.new_path(".segments"))
+        for i in range(0, count, 500):
+            log.append_many(rows[i:i + 500])
+        log.close()
+
+    results = {"append": result(count, timed(append, args.repeat), "records/s")}
+
+    log = SegmentedRecordLog(work.new_path(".segments"))
+    log.append_many(rows)
+    on_disk, text = disk_usage(log)
+    month = rows[count // 2].date[:7]
+    in_month = sum(1 for record in rows if record.date.startswith(month))
+
+    def counts():
+        for _ in range(queries):
+            log.diagnosis_counts()
+
+    def month_range():
+        assert sum(1 for _ in log.read_range(month + "-01", month + "-31")) == in_month
+
+    results.update({
+        "counts": result(queries, timed(counts, args.repeat), "queries/s"),
+        "range_month": result(in_month, timed(month_range, args.repeat), "records/s")
+    })
+    results["append"]["compression"] = round(text / on_disk, 1)
+    log.close()
+    return results
+
+BENCHMARKS = {
+    "inference": bench_inference,
+    "append": bench_append,
+    "parse": bench_parse,
+    "aggregate": bench_aggregate,
+    "analytics": bench_analytics,
+    "segments": bench_segments
+}
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline):
+    # rate of each benchmark relative to the baseline file
+    for group, entries in results.items():
+        for name, entry in entries.items():
+            old = baseline.get("results", {}).get(group, {}).get(name)
+            if old and old.get("rate") and entry["rate"]:
+                print(f"{group}.{name:16s} {entry['rate'] / old['rate']:6.2f}x "
+                      f"({old['rate']:.0f} -> {entry['rate']:.0f} {entry['unit']})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the hot-path benchmarks.")
+    parser.add_argument("benchmarks", nargs="*",
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--records", type=int, default=100000,
+                        help="records in the synthetic log (parse, aggregate)")
+    parser.add_argument("--inference", type=int, default=20000,
+                        help="diagnoses per inference run")
+    parser.add_argument("--appends", type=int, default=20000,
+                        help="records per append run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, best is kept")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    args = parser.parse_args(argv)
+
+    names = args.benchmarks or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+    count = max(args.records, args.inference, args.appends)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        work = Workload(count, args.records, args.seed, workdir)
+        results = {}
+        for name in names:
+            results[name] = BENCHMARKS[name](work, args)
+            for entry_name, entry in results[name].items():
+                print(f"{name}.{entry_name:16s} {entry['rate']:>14,.1f} {entry['unit']}"
+                      f"  ({entry['seconds']:.3f} s)")
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args) | {"benchmarks": names},
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
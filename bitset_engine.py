@@ -0,0 +1,214 @@
+import re
+import sys
+import time
+
+# Pure-Python backend for the rule base. Every rule in rules.clp is a
+# conjunction of symptom facts that asserts a symptom or a diagnosis, so
+# each fact gets a bit, each rule becomes (condition mask, conclusion
+# bits) and a diagnosis is the fixpoint of OR-ing in the conclusions of
+# the rules whose mask is covered. No clipspy needed.
+#
+# Select it with ALZ_ENGINE=bitset; engine.diagnose, diagnose_many,
+# diagnose_detailed and DiagnosisSession then come from this module.
+# Rules of any other shape are refused with ValueError, so a reload with
+# such a rule is rejected just like a file CLIPS cannot build.
+#
+#   python bitset_engine.py          # compare with CLIPS on every input
+
+TOKEN = re.compile(r'\s*(?:;[^\n]*|("(?:[^"\\]|\\.)*")|([()])|([^\s()";]+))')
+
+def parse_sexpr(text):
+    # one construct -> nested lists of atoms; strings become str atoms too
+    stack = [[]]
+    for match in TOKEN.finditer(text):
+        string, paren, atom = match.groups()
+        if paren == "(":
+            stack.append([])
+        elif paren == ")":
+            if len(stack) == 1:
+                raise ValueError("unbalanced ')'")
+            done = stack.pop()
+            stack[-1].append(done)
+        elif string or atom:
+            stack[-1].append(string or atom)
+    if len(stack) != 1 or len(stack[0]) != 1:
+        raise ValueError("not a single construct")
+    return stack[0][0]
+
+def fact(pattern):
+    # (symptom (code X)) -> ("symptom", "X"), (diagnosis (result X)) likewise
+    if (len(pattern) == 2 and isinstance(pattern[1], list) and len(pattern[1]) == 2
+            and (pattern[0], pattern[1][0]) in (("symptom", "code"), ("diagnosis", "result"))
+            and isinstance(pattern[1][1], str) and not pattern[1][1].startswith(("?", '"'))):
+        return pattern[0], pattern[1][1]
+    raise ValueError(f"unsupported pattern {pattern}")
+
+def parse_rule(text):
+    # (name, [condition facts], [asserted facts]) of a plain conjunction rule
+    form = parse_sexpr(text)
+    if len(form) < 2 or form[0] != "defrule" or "=>" not in form:
+        raise ValueError("not a defrule")
+    name = form[1]
+    arrow = form.index("=>")
+    lhs = [item for item in form[2:arrow] if not (isinstance(item, str) and item.startswith('"'))]
+    try:
+        conditions = []
+        for item in lhs:
+            if isinstance(item, list) and item and item[0] == "logical":
+                conditions.extend(fact(pattern) for pattern in item[1:])
+            else:
+                conditions.append(fact(item))
+        conclusions = []
+        for action in form[arrow + 1:]:
+            if not (isinstance(action, list) and action[0] == "assert"):
+                raise ValueError(f"unsupported action {action}")
+            conclusions.extend(fact(pattern) for pattern in action[1:])
+    except ValueError as e:
+        raise ValueError(f"rule {name}: {e}") from None
+    return name, conditions, conclusions
+
+class BitsetRules:
+    def __init__(self, rule_base):
+        self.rule_base = rule_base
+        self.bits = {}      # ("symptom" | "diagnosis", code) -> bit
+        self.rules = []     # (name, condition mask, conclusion mask)
+        for text in rule_base.rules:
+            name, conditions, conclusions = parse_rule(text)
+            self.rules.append((name, self._mask(conditions), self._mask(conclusions)))
+        self.symptom_bits = {code: bit for (kind, code), bit in self.bits.items() if kind == "symptom"}
+        self.names = {bit: fact for fact, bit in self.bits.items()}
+        # most severe first, as engine.pick_stage
+        self.stage_bits = [(self.bits[("diagnosis", stage)], stage)
+                           for stage in engine.STAGES if ("diagnosis", stage) in self.bits]
+
+    def _mask(self, facts):
+        mask = 0
+        for f in facts:
+            if f not in self.bits:
+                self.bits[f] = 1 << len(self.bits)
+            mask |= self.bits[f]
+        return mask
+
+    def to_state(self, symptoms):
+        # codes no rule mentions cannot make a rule fire, so they get no bit
+        state = 0
+        bits = self.symptom_bits
+        for code in symptoms:
+            state |= bits.get(code, 0)
+        return state
+
+    def closure(self, state):
+        # apply every rule until nothing new is derived
+        rules = self.rules
+        while True:
+            before = state
+            for _, mask, out in rules:
+                if state & mask == mask:
+                    state |= out
+            if state == before:
+                return state
+
+    def facts(self, state, kind):
+        return tuple(code for bit, (k, code) in sorted(self.names.items()) if k == kind and state & bit)
+
+    def stage(self, state):
+        for bit, stage in self.stage_bits:
+            if state & bit:
+                return stage
+        return "None"
+
+_compiled = None
+
+def compile_rules(rule_base):
+    # ValueError for a rule base this backend cannot run
+    return BitsetRules(rule_base)
+
+def current():
+    global _compiled
+    rule_base = engine.current_rules()
+    compiled = _compiled
+    if compiled is None or compiled.rule_base is not rule_base:
+        compiled = _compiled = BitsetRules(rule_base)
+    return compiled
+
+def diagnose(symptoms):
+    rules = current()
+    return rules.stage(rules.closure(rules.to_state(symptoms)))
+
+def diagnose_many(symptom_sets):
+    for symptoms in symptom_sets:
+        yield diagnose(symptoms)
+
+def diagnose_detailed(symptoms):
+    start = time.perf_counter()
+    rules = current()
+    given = rules.to_state(symptoms)
+    state = rules.closure(given)
+    diagnoses = rules.facts(state, "diagnosis")
+    derived = rules.facts(state & ~given, "symptom")
+    elapsed = time.perf_counter() - start
+    return engine.Diagnosis(
+        result=engine.pick_stage(diagnoses),
+        diagnoses=diagnoses,
+        derived=derived,
+        rules_fired=sum(1 for _, mask, _ in rules.rules if state & mask == mask),
+        facts_asserted=len(set(symptoms)) + len(derived) + len(diagnoses),
+        elapsed=elapsed
+    )
+
+class DiagnosisSession:
+    # same interface as engine.DiagnosisSession; the closure of the
+    # selected symptoms is cheap enough to recompute on every toggle
+
+    def __init__(self):
+        self._selected = set()
+
+    def add(self, code):
+        self._selected.add(code)
+        return self.result()
+
+    def remove(self, code):
+        self._selected.discard(code)
+        return self.result()
+
+    def set(self, code, selected):
+        return self.add(code) if selected else self.remove(code)
+
+    def clear(self):
+        self._selected.clear()
+
+    def symptoms(self):
+        return sorted(self._selected)
+
+    def result(self):
+        return diagnose(self._selected)
+
+# engine imports this module at its end under ALZ_ENGINE=bitset, so the
+# import back goes after everything engine takes from here; engine is only
+# used inside functions
+import engine
+
+def compare_with_clips():
+    # every combination of the selectable symptoms through both engines;
+    # returns the inputs where stage, diagnoses, derived codes or the
+    # number of rules fired differ
+    codes = list(engine.SYMPTOMS)
+    env = engine.build_environment()
+    mismatches = []
+    for mask in range(1 << len(codes)):
+        symptoms = [code for i, code in enumerate(codes) if mask >> i & 1]
+        clips = engine.run_detailed(env, symptoms)
+        bits = diagnose_detailed(symptoms)
+        if (clips.result != bits.result
+                or set(clips.diagnoses) != set(bits.diagnoses)
+                or set(clips.derived) != set(bits.derived)
+                or clips.rules_fired != bits.rules_fired):
+            mismatches.append((symptoms, clips, bits))
+    return mismatches
+
+if __name__ == "__main__":
+    mismatches = compare_with_clips()
+    for symptoms, clips, bits in mismatches[:20]:
+        print(f"{symptoms}: clips {clips} bitset {bits}")
+    print(f"{(1 << len(engine.SYMPTOMS)) - len(mismatches)}/{1 << len(engine.SYMPTOMS)} inputs agree")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,150 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import engine
+
+# Bulk screening: stream a CSV or JSONL file of symptom sets through a pool
+# of worker processes and write the results in input order.
+#
+#   python bulk_screen.py intake.csv -o results.csv
+#   python bulk_screen.py intake.jsonl --workers 8 > results.jsonl
+#
+# CSV input needs a "symptoms" column (codes separated by commas, spaces or
+# semicolons); other columns are copied to the output. JSONL lines are
+# either a list of codes or an object with a "symptoms" list (or string,
+# split like the CSV column). Each output record gets a "diagnosis" field.
+
+CODE_SEPARATORS = re.compile(r"[\s,;]+")
+
+def split_codes(text):
+    return [code for code in CODE_SEPARATORS.split(text) if code and code != "-"]
+
+def read_csv(f):
+    reader = csv.DictReader(f)
+    if not reader.fieldnames or "symptoms" not in reader.fieldnames:
+        raise ValueError("CSV input needs a 'symptoms' column")
+    for row in reader:
+        yield row, split_codes(row["symptoms"] or "")
+
+def read_jsonl(f):
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if isinstance(record, list):
+            record = {"symptoms": record}
+        symptoms = record.get("symptoms") if isinstance(record, dict) else None
+        # a string is split like a CSV cell rather than read char by char
+        if isinstance(symptoms, str):
+            symptoms = split_codes(symptoms)
+        if not isinstance(symptoms, list) or not all(isinstance(code, str) for code in symptoms):
+            raise ValueError(f"JSONL line {line_number}: needs a list of codes or an object with a 'symptoms' list")
+        yield record, symptoms
+
+class CsvOutput:
+    def __init__(self, f):
+        self.f = f
+        self.writer = None
+
+    def write(self, row, diagnosis):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.f, fieldnames=list(row) + ["diagnosis"])
+            self.writer.writeheader()
+        row["diagnosis"] = diagnosis
+        self.writer.writerow(row)
+
+class JsonlOutput:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, record, diagnosis):
+        record["diagnosis"] = diagnosis
+        self.f.write(json.dumps(record) + "\n")
+
+FORMATS = {
+    "csv": (read_csv, CsvOutput),
+    "jsonl": (read_jsonl, JsonlOutput),
+}
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# worker side: every process sets up its own engine (a CLIPS environment,
+# or the compiled bitset rules) once
+def _init_worker():
+    engine.diagnose(())
+
+def _screen_batch(symptom_sets):
+    return list(engine.diagnose_many(symptom_sets))
+
+def screen(records, output, workers, batch_size=1000, max_pending=None):
+    # At most max_pending batches are in flight, so memory stays constant no
+    # matter how large the input is. Batches are collected oldest first,
+    # which keeps the output in input order.
+    max_pending = max_pending or workers * 4
+    pending = deque()
+    count = 0
+
+    def drain_one():
+        rows, result = pending.popleft()
+        for row, diagnosis in zip(rows, result.get()):
+            output.write(row, diagnosis)
+        return len(rows)
+
+    with Pool(workers, initializer=_init_worker) as pool:
+        for batch in batches(records, batch_size):
+            rows = [row for row, _ in batch]
+            symptom_sets = [symptoms for _, symptoms in batch]
+            pending.append((rows, pool.apply_async(_screen_batch, (symptom_sets,))))
+            if len(pending) >= max_pending:
+                count += drain_one()
+        while pending:
+            count += drain_one()
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk Alzheimer's screening from CSV or JSONL.")
+    parser.add_argument("input", help="input file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=FORMATS, help="input/output format (default: from file extension)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or os.path.splitext(args.input)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        parser.error("cannot tell the format from the file name, use --format csv|jsonl")
+    reader, writer = FORMATS[fmt]
+
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        start = time.perf_counter()
+        count = screen(reader(src), writer(dst), args.workers, args.batch_size)
+        elapsed = time.perf_counter() - start
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+    rate = count / elapsed if elapsed else 0.0
+    print(f"{count} records in {elapsed:.2f}s ({rate:,.0f} records/sec, {args.workers} workers)",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
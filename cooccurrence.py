@@ -0,0 +1,170 @@
+import json
+import os
+import sys
+import time
+from array import array
+from collections import namedtuple
+import numpy as np
+import rule_table
+from records import temp_path
+
+# Symptom co-occurrence and symptom / diagnosis lift for the admin
+# analytics page. Records are bitmask-encoded as in rule_table (bit i is
+# rule_table.CODES[i]), and all that is kept is a histogram of how many
+# records had each (mask, diagnosis): 32768 x 4 counts. Every statistic is
+# a matrix product of that histogram with the 32768 x 15 bit matrix, so
+# its cost does not depend on the number of records. refresh() adds the
+# records appended since the last checkpoint with one bincount per batch
+# and saves the histogram next to the store as <store>.cooc.
+#
+#   python cooccurrence.py diagnosis_records.db     # print the tables
+#
+# lift = P(a and b) / (P(a) P(b)): above 1 the two occur together more
+# often than if they were independent, below 1 less often.
+
+CODES = rule_table.CODES
+DIAGNOSES = rule_table.RESULTS
+MASK_COUNT = 1 << len(CODES)
+DIAGNOSIS_INDEX = {code: i for i, code in enumerate(DIAGNOSES)}
+MAGIC = "COOC1"
+
+# row m holds the bits of mask m as 0.0 / 1.0; float64 keeps counts exact
+BIT_MATRIX = ((np.arange(MASK_COUNT)[:, None] >> np.arange(len(CODES))) & 1).astype(np.float64)
+
+Tables = namedtuple("Tables", [
+    "total",            # records counted
+    "symptoms",         # records with each symptom, (15,)
+    "diagnoses",        # records with each diagnosis, (4,)
+    "pairs",            # records with both symptoms, (15, 15); diagonal = symptoms
+    "by_diagnosis",     # records with the symptom and the diagnosis, (15, 4)
+    "pair_lift",        # (15, 15), nan where a symptom never occurs
+    "lift"              # (15, 4), nan where a symptom or diagnosis never occurs
+])
+
+def lift(joint, left, right, total):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = total * joint / np.outer(left, right)
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+def tables_from_histogram(histogram):
+    per_mask = histogram.sum(axis=1).astype(np.float64)
+    total = int(per_mask.sum())
+    pairs = BIT_MATRIX.T @ (BIT_MATRIX * per_mask[:, None])
+    by_diagnosis = BIT_MATRIX.T @ histogram.astype(np.float64)
+    symptoms = np.diag(pairs).copy()
+    diagnoses = histogram.sum(axis=0).astype(np.float64)
+    return Tables(
+        total=total,
+        symptoms=symptoms,
+        diagnoses=diagnoses,
+        pairs=pairs,
+        by_diagnosis=by_diagnosis,
+        pair_lift=lift(pairs, symptoms, symptoms, total),
+        lift=lift(by_diagnosis, symptoms, diagnoses, total)
+    )
+
+class CooccurrenceStats:
+    BATCH = 100000      # records encoded before they are added to the histogram
+
+    def __init__(self, store, path=None):
+        self.store = store
+        self.path = path or store.path + ".cooc"
+        self.checkpoint = None
+        self.histogram = np.zeros((MASK_COUNT, len(DIAGNOSES)), dtype=np.int64)
+        self._tables = None
+        self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                header = json.loads(str(data["header"]))
+                histogram = data["histogram"]
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            return
+        if header.get("magic") != MAGIC or histogram.shape != self.histogram.shape:
+            return
+        if self.store.checkpoint_valid(header["checkpoint"]):
+            self.checkpoint = header["checkpoint"]
+            self.histogram = histogram.astype(np.int64)
+
+    def save(self):
+        header = json.dumps({"magic": MAGIC, "checkpoint": self.checkpoint})
+        tmp_path = temp_path(self.path)
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, header=np.array(header), histogram=self.histogram)
+        os.replace(tmp_path, self.path)
+
+    def _add(self, masks, diagnoses):
+        if masks:
+            keys = np.frombuffer(masks, dtype=np.uint16).astype(np.int64) * len(DIAGNOSES)
+            keys += np.frombuffer(diagnoses, dtype=np.uint8)
+            counts = np.bincount(keys, minlength=self.histogram.size)
+            self.histogram += counts.reshape(self.histogram.shape)
+
+    def refresh(self):
+        # count the records appended since the last refresh; True if any
+        if not self.store.checkpoint_valid(self.checkpoint):
+            self.checkpoint = None
+            self.histogram[:] = 0
+            self._tables = None
+
+        bits = rule_table.BITS
+        masks, diagnoses = array("H"), array("B")
+        added = False
+        for record, checkpoint in self.store.read_since(self.checkpoint):
+            self.checkpoint = checkpoint
+            added = True
+            # codes outside the selectable symptoms and unknown diagnoses
+            # are left out of the tables
+            diagnosis = DIAGNOSIS_INDEX.get(record.diagnosis)
+            if diagnosis is None:
+                continue
+            mask = 0
+            for code in record.symptoms:
+                mask |= bits.get(code, 0)
+            masks.append(mask)
+            diagnoses.append(diagnosis)
+            if len(masks) >= self.BATCH:
+                self._add(masks, diagnoses)
+                masks, diagnoses = array("H"), array("B")
+        self._add(masks, diagnoses)
+
+        if added:
+            self._tables = None
+            self.save()
+        return added
+
+    def tables(self):
+        # refreshes first; cached until new records arrive
+        self.refresh()
+        if self._tables is None:
+            self._tables = tables_from_histogram(self.histogram)
+        return self._tables
+
+def print_tables(tables, out=sys.stdout):
+    out.write(f"{tables.total} records\n\nco-occurrence (records with both symptoms)\n")
+    out.write("      " + " ".join(f"{code:>6s}" for code in CODES) + "\n")
+    for code, row in zip(CODES, tables.pairs):
+        out.write(f"{code:6s}" + " ".join(f"{int(n):6d}" for n in row) + "\n")
+    out.write("\nlift by diagnosis\n")
+    out.write("      " + " ".join(f"{code:>6s}" for code in DIAGNOSES) + "\n")
+    for code, row in zip(CODES, tables.lift):
+        out.write(f"{code:6s}" + " ".join("     -" if np.isnan(x) else f"{x:6.2f}" for x in row) + "\n")
+
+if __name__ == "__main__":
+    import records
+
+    if len(sys.argv) != 2:
+        sys.exit("usage: python cooccurrence.py diagnosis_records.db")
+    store = records.open_records(sys.argv[1])
+    stats = CooccurrenceStats(store)
+    start = time.perf_counter()
+    stats.refresh()
+    refreshed = time.perf_counter() - start
+    start = time.perf_counter()
+    tables = stats.tables()
+    computed = time.perf_counter() - start
+    print_tables(tables)
+    print(f"\nrefresh {refreshed * 1000:.1f} ms, tables {computed * 1000:.1f} ms")
+    store.close()
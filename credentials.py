@@ -0,0 +1,194 @@
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+
+# Admin credentials in admin.txt, one "email,password-hash" line per admin:
+#   admin@example.com,pbkdf2_sha256$200000$<salt>$<hash>
+# (salt and hash base64). Lines from the old format with a plaintext
+# password are still accepted until the file is migrated:
+#   python credentials.py migrate admin.txt
+#   python credentials.py set admin.txt admin@example.com
+#
+# CredentialStore keeps the parsed file in a dict keyed by email and only
+# re-reads it when its mtime or size changes. Plaintext passwords are
+# hashed in memory as the file is read, so every check costs one hash:
+# known, unknown and not yet migrated emails all take the same time.
+# After MAX_FAILURES wrong passwords an account is locked for
+# LOCKOUT_SECONDS, doubling with every further failure up to
+# MAX_LOCKOUT_SECONDS; while locked, check() refuses without hashing, so a
+# brute-force loop cannot keep the CPU busy. An email is forgotten
+# FAILURE_MEMORY_SECONDS after its last failure once it is not locked, and
+# at most MAX_TRACKED emails are remembered, so logins with made-up emails
+# cannot grow the table without bound.
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = 200000
+SALT_BYTES = 16
+
+MAX_FAILURES = 5
+LOCKOUT_SECONDS = 1.0
+MAX_LOCKOUT_SECONDS = 300.0
+FAILURE_MEMORY_SECONDS = 900.0
+MAX_TRACKED = 10000
+
+class TooManyAttempts(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"too many failed logins, try again in {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+def b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+def hash_password(password, salt=None, iterations=ITERATIONS):
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${b64(salt)}${b64(digest)}"
+
+def parse_hash(stored):
+    # (iterations, salt, digest), or None for a legacy plaintext password
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != ALGORITHM:
+        return None
+    return int(parts[1]), base64.b64decode(parts[2]), base64.b64decode(parts[3])
+
+def verify_password(password, stored):
+    parsed = parse_hash(stored)
+    if parsed is None:
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    iterations, salt, digest = parsed
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return hmac.compare_digest(candidate, digest)
+
+def read_credentials(path):
+    # {email: stored password}
+    credentials = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            email, _, stored = line.partition(",")
+            credentials[email.strip()] = stored.strip()
+    return credentials
+
+def write_credentials(path, credentials):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for email, stored in credentials.items():
+            f.write(f"{email},{stored}\n")
+    os.replace(tmp_path, path)
+
+# checked for unknown emails so they take as long as known ones
+_DUMMY_HASH = f"{ALGORITHM}${ITERATIONS}${b64(bytes(SALT_BYTES))}${b64(bytes(32))}"
+
+class CredentialStore:
+    def __init__(self, path="admin.txt"):
+        self.path = path
+        self._credentials = {}
+        self._plaintext = 0     # entries still stored in plaintext in the file
+        self._stamp = None
+        self._failures = {}     # email -> (failures, locked until, last failure)
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        # FileNotFoundError propagates, the caller reports it
+        st = os.stat(self.path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            credentials = read_credentials(self.path)
+            self._plaintext = 0
+            for email, stored in credentials.items():
+                if parse_hash(stored) is None:
+                    credentials[email] = hash_password(stored)
+                    self._plaintext += 1
+            self._credentials = credentials
+            self._stamp = stamp
+
+    def needs_migration(self):
+        with self._lock:
+            self._reload()
+            return self._plaintext > 0
+
+    def check(self, email, password):
+        # True / False, or TooManyAttempts while the account is locked
+        with self._lock:
+            self._reload()
+            stored = self._credentials.get(email)
+            _, locked_until, _ = self._failures.get(email, (0, 0.0, 0.0))
+            now = time.monotonic()
+            if locked_until > now:
+                raise TooManyAttempts(locked_until - now)
+
+        ok = verify_password(password, stored if stored is not None else _DUMMY_HASH)
+        ok = ok and stored is not None
+
+        with self._lock:
+            if ok:
+                self._failures.pop(email, None)
+            else:
+                now = time.monotonic()
+                failures = self._failures.get(email, (0, 0.0, 0.0))[0] + 1
+                locked_until = 0.0
+                if failures >= MAX_FAILURES:
+                    lockout = LOCKOUT_SECONDS * 2 ** (failures - MAX_FAILURES)
+                    locked_until = now + min(lockout, MAX_LOCKOUT_SECONDS)
+                self._failures[email] = (failures, locked_until, now)
+                if len(self._failures) > MAX_TRACKED:
+                    self._forget_failures(now)
+        return ok
+
+    def _forget_failures(self, now):
+        # drop unlocked emails whose last failure is old, then the oldest
+        # ones if that was not enough; called with the lock held
+        for email, (_, locked_until, last) in list(self._failures.items()):
+            if locked_until <= now and now - last >= FAILURE_MEMORY_SECONDS:
+                del self._failures[email]
+        if len(self._failures) > MAX_TRACKED:
+            oldest = sorted(self._failures, key=lambda email: self._failures[email][2])
+            for email in oldest[:len(self._failures) - MAX_TRACKED]:
+                del self._failures[email]
+
+def migrate(path):
+    # hash every plaintext password in place, returns how many were hashed
+    credentials = read_credentials(path)
+    migrated = 0
+    for email, stored in credentials.items():
+        if parse_hash(stored) is None:
+            credentials[email] = hash_password(stored)
+            migrated += 1
+    if migrated:
+        write_credentials(path, credentials)
+    return migrated
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the admin credential file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="hash the plaintext passwords in a file")
+    migrate_parser.add_argument("path", nargs="?", default="admin.txt")
+    set_parser = commands.add_parser("set", help="add an admin or change a password")
+    set_parser.add_argument("path")
+    set_parser.add_argument("email")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        print(f"{migrate(args.path)} password(s) hashed in {args.path}")
+        return
+
+    try:
+        credentials = read_credentials(args.path)
+    except FileNotFoundError:
+        credentials = {}
+    password = getpass.getpass(f"Password for {args.email}: ")
+    if password != getpass.getpass("Repeat: "):
+        sys.exit("passwords do not match")
+    credentials[args.email] = hash_password(password)
+    write_credentials(args.path, credentials)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,540 @@
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+import metrics
+
+try:
+    from clips import CLIPSError, Router, Symbol
+    import rule_image
+except ImportError:
+    # without clipspy only the bitset backend (ALZ_ENGINE=bitset) can run
+    class CLIPSError(Exception):
+        pass
+    Symbol = rule_image = None
+    Router = object
+
+# Rule base and inference for the Alzheimer's screening system.
+# Kept free of any Tk code so scripts and services can import it.
+#
+# The rules themselves live in rules.clp (or the file named by ALZ_RULES).
+# reload_rules() compiles and checks a new version of the file next to
+# the running one and swaps it in between two diagnoses; RuleWatcher
+# calls it whenever the file changes.
+#
+# ALZ_ENGINE picks the inference backend: "clips" (default) or "bitset",
+# the pure-Python bitmask engine in bitset_engine.py. Both are used
+# through the functions and DiagnosisSession class below.
+
+BACKENDS = ("clips", "bitset")
+BACKEND = os.environ.get("ALZ_ENGINE", "clips")
+if BACKEND not in BACKENDS:
+    raise ValueError(f"ALZ_ENGINE must be one of {BACKENDS}")
+
+# selectable symptoms shown on the diagnosis page
+SYMPTOMS = {
+    "G001": "Memory decline",
+    "G002": "Confused in familiar places",
+    "G004": "Daily activities slower than usual",
+    "G005": "Loss of initiative",
+    "G007": "Memory getting worse",
+    "G008": "Difficulty thinking logically",
+    "G009": "Difficulty reading / writing / counting",
+    "G011": "Cannot learn new things",
+    "G012": "Restless or anxious at night",
+    "G014": "Repeats same movements",
+    "G015": "Difficulty controlling emotions",
+    "G017": "Convulsions",
+    "G018": "Difficulty swallowing food",
+    "G020": "Cannot communicate properly",
+    "G021": "Cannot recognize close family members"
+}
+
+# most severe stage first
+STAGES = ("P003", "P002", "P001")
+
+TEMPLATES = [
+"""
+(deftemplate symptom (slot code))
+""",
+"""
+(deftemplate diagnosis (slot result))
+""",
+]
+
+
+# Helpers called through clipspy's function interface, so nothing is
+# parsed per call and no Fact handles cross into Python (held Fact handles
+# keep retracted facts alive and slow the env down).
+# assert-symptoms: assert the given codes, returns how many. CLIPS 6.4
+# hands back the existing fact for a duplicate assert, so a code given
+# twice is counted twice; run_detailed() passes each code once.
+# screen: reset, assert the given codes, run and return the diagnoses.
+# add-symptom / remove-symptom: one toggle of a live session.
+FUNCTIONS = [
+"""
+(deffunction diagnoses ()
+   (bind ?results (create$))
+   (do-for-all-facts ((?d diagnosis)) TRUE
+      (bind ?results (create$ ?results ?d:result)))
+   ?results)
+""",
+"""
+(deffunction symptom-codes ()
+   (bind ?codes (create$))
+   (do-for-all-facts ((?s symptom)) TRUE
+      (bind ?codes (create$ ?codes ?s:code)))
+   ?codes)
+""",
+"""
+(deffunction assert-symptoms ($?codes)
+   (bind ?count 0)
+   (foreach ?code ?codes
+      (if (assert (symptom (code ?code))) then
+         (bind ?count (+ ?count 1))))
+   ?count)
+""",
+"""
+(deffunction screen ($?codes)
+   (reset)
+   (assert-symptoms ?codes)
+   (run)
+   (diagnoses))
+""",
+"""
+(deffunction add-symptom (?code)
+   (assert (symptom (code ?code)))
+   (run)
+   (diagnoses))
+""",
+"""
+(deffunction retract-symptom (?code)
+   (do-for-fact ((?s symptom)) (eq ?s:code ?code)
+      (retract ?s)))
+""",
+"""
+(deffunction remove-symptom (?code)
+   (retract-symptom ?code)
+   (run)
+   (diagnoses))
+""",
+]
+
+RULES_PATH = os.environ.get(
+    "ALZ_RULES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.clp")
+)
+
+def line_number(text, index):
+    return text.count("\n", 0, index) + 1
+
+def split_constructs(text):
+    # the top-level (...) forms of a .clp file; ; comments and strings are
+    # skipped, anything else outside a form is an error
+    constructs = []
+    depth = 0
+    start = 0
+    in_string = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if ch == "\\":
+                i += 1
+            elif ch == '"':
+                in_string = False
+        elif ch == ";":
+            end = text.find("\n", i)
+            i = len(text) if end == -1 else end
+            continue
+        elif ch == "(":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == ")":
+            if depth == 0:
+                raise ValueError(f"line {line_number(text, i)}: unbalanced ')'")
+            depth -= 1
+            if depth == 0:
+                constructs.append(text[start:i + 1])
+        elif ch == '"' and depth:
+            in_string = True
+        elif not depth and not ch.isspace():
+            raise ValueError(f"line {line_number(text, i)}: text outside a construct")
+        i += 1
+    if depth or in_string:
+        raise ValueError("unexpected end of file inside a construct")
+    return constructs
+
+def read_rules(path=RULES_PATH):
+    # the defrule constructs of a rule file; ValueError if it has anything else
+    with open(path, "r", encoding="utf-8") as f:
+        rules = split_constructs(f.read())
+    if not rules:
+        raise ValueError(f"{path} has no rules")
+    for rule in rules:
+        if not re.match(r"\(\s*defrule\s", rule):
+            raise ValueError(f"only defrule constructs are allowed: {rule[:40]}")
+        check_logical(rule)
+    return rules
+
+def check_logical(rule):
+    # DiagnosisSession retracts unticked symptoms from a live environment,
+    # so every condition has to sit in one (logical ...) for the facts a
+    # rule derived to go with them; ValueError otherwise
+    from bitset_engine import parse_sexpr
+    form = parse_sexpr(rule)
+    if len(form) < 2 or "=>" not in form:
+        raise ValueError(f"not a defrule: {rule[:40]}")
+    lhs = [item for item in form[2:form.index("=>")]
+           if not (isinstance(item, str) and item.startswith('"'))
+           and not (isinstance(item, list) and item and item[0] == "declare")]
+    if len(lhs) != 1 or not isinstance(lhs[0], list) or not lhs[0] or lhs[0][0] != "logical":
+        raise ValueError(f"rule {form[1]}: the conditions must be wrapped in one (logical ...)")
+
+# one version of the rule base: its defrules, every construct the engine
+# builds from them, and the digest images and tables are keyed by
+RuleBase = namedtuple("RuleBase", ["rules", "constructs", "digest"])
+
+def make_rule_base(rules):
+    constructs = tuple(TEMPLATES + list(rules) + FUNCTIONS)
+    return RuleBase(tuple(rules), constructs,
+                    hashlib.sha256("".join(constructs).encode("utf-8")).digest())
+
+# the active rule base; replaced as a whole by reload_rules()
+_rules = make_rule_base(read_rules())
+
+def current_rules():
+    return _rules
+
+def rules_digest():
+    # changes whenever a rule is edited
+    return _rules.digest
+
+def build_environment(rules=None):
+    # bload the saved rule image, compiling only when the rules changed
+    if rule_image is None:
+        raise RuntimeError("the CLIPS backend needs clipspy; install it or set ALZ_ENGINE=bitset")
+    return rule_image.load_or_build("engine", (rules or _rules).constructs)
+
+def pick_stage(diagnoses):
+    for stage in STAGES:
+        if stage in diagnoses:
+            return stage
+    return "None"
+
+def run_environment(env, symptoms):
+    if metrics.enabled:
+        return run_timed(env, symptoms)
+    screen = env.find_function("screen")
+    return pick_stage(screen(*(Symbol(code) for code in symptoms)))
+
+def run_timed(env, symptoms):
+    # the steps of the screen deffunction one call at a time, so each
+    # phase shows up in the metrics
+    assert_symptoms = env.find_function("assert-symptoms")
+    diagnoses = env.find_function("diagnoses")
+    with metrics.phase("engine.reset"):
+        env.reset()
+    with metrics.phase("engine.assert"):
+        assert_symptoms(*(Symbol(code) for code in symptoms))
+    with metrics.phase("engine.run"):
+        env.run()
+    with metrics.phase("engine.scan"):
+        return pick_stage(diagnoses())
+
+# result of diagnose_detailed(): the stage plus what the inference did
+Diagnosis = namedtuple(
+    "Diagnosis",
+    ["result", "diagnoses", "derived", "rules_fired", "facts_asserted", "elapsed"]
+)
+
+def run_detailed(env, symptoms):
+    start = time.perf_counter()
+    given = dict.fromkeys(symptoms)
+    env.reset()
+    asserted = env.find_function("assert-symptoms")(*(Symbol(code) for code in given))
+    rules_fired = env.run()
+    diagnoses = tuple(str(d) for d in env.find_function("diagnoses")())
+    derived = tuple(str(c) for c in env.find_function("symptom-codes")() if c not in given)
+    elapsed = time.perf_counter() - start
+
+    return Diagnosis(
+        result=pick_stage(diagnoses),
+        diagnoses=diagnoses,
+        derived=derived,
+        rules_fired=rules_fired,
+        facts_asserted=asserted + len(derived) + len(diagnoses),
+        elapsed=elapsed
+    )
+
+# shared environment: (rule base, env, screen function), built on first
+# use and replaced in one assignment when the rules are reloaded
+_shared = None
+_swap_lock = threading.Lock()
+
+def _shared_environment():
+    shared = _shared
+    if shared is None or shared[0] is not _rules:
+        shared = _build_shared()
+    return shared
+
+def _build_shared():
+    global _shared
+    with _swap_lock:
+        if _shared is None or _shared[0] is not _rules:
+            env = build_environment(_rules)
+            _shared = (_rules, env, env.find_function("screen"))
+        return _shared
+
+def get_environment():
+    return _shared_environment()[1]
+
+def diagnose(symptoms):
+    _, env, screen = _shared_environment()
+    if metrics.enabled:
+        return run_timed(env, symptoms)
+    return pick_stage(screen(*(Symbol(code) for code in symptoms)))
+
+def diagnose_detailed(symptoms):
+    return run_detailed(get_environment(), symptoms)
+
+def diagnose_many(symptom_sets):
+    # one environment for the whole batch, results yielded in input order
+    _, env, screen = _shared_environment()
+    for symptoms in symptom_sets:
+        if metrics.enabled:
+            yield run_timed(env, symptoms)
+        else:
+            yield pick_stage(screen(*(Symbol(code) for code in symptoms)))
+
+# symptom sets a new rule base has to diagnose the same way before a
+# reload swaps it in; ValueError from check_known_cases() otherwise
+KNOWN_CASES = (
+    ((), "None"),
+    (("G001", "G002"), "None"),
+    (("G001", "G002", "G004", "G005"), "P001"),
+    (("G007", "G008", "G009", "G011", "G012", "G014", "G015"), "P002"),
+    (("G017", "G018", "G020", "G021"), "P003")
+)
+
+def check_known_cases(diagnose_case):
+    for symptoms, expected in KNOWN_CASES:
+        result = diagnose_case(symptoms)
+        if result != expected:
+            raise ValueError(f"{', '.join(symptoms) or 'no symptoms'} gives {result}, expected {expected}")
+
+class TrialErrors(Router):
+    # what CLIPS writes to stderr during a trial run: clipspy does not
+    # raise when a rule's actions fail, CLIPS just halts and prints
+    def __init__(self):
+        super().__init__("trial-errors", 50)
+        self.messages = []
+
+    def query(self, name):
+        return name == "stderr"
+
+    def write(self, name, message):
+        self.messages.append(message)
+
+def compile_rules(rules):
+    # a fresh environment for a rule base, after a trial run with every
+    # symptom and the KNOWN_CASES; CLIPSError if the rules do not build or
+    # a run hits an error, ValueError if a known case changes
+    env = rule_image.build(rules.constructs)
+    screen = env.find_function("screen")
+    errors = TrialErrors()
+    env.add_router(errors)
+
+    def run(symptoms):
+        diagnoses = screen(*(Symbol(code) for code in symptoms))
+        if errors.messages:
+            raise CLIPSError(env, message=" ".join("".join(errors.messages).split()))
+        return pick_stage(diagnoses)
+
+    try:
+        run(SYMPTOMS)
+        check_known_cases(run)
+    finally:
+        errors.delete()
+    return env
+
+def reload_rules(path=RULES_PATH):
+    # Compile the rule file next to the running rules and swap it in.
+    # Raises ValueError / CLIPSError / OSError for a bad file, leaving the
+    # old rules in place. Returns the timings in seconds, or None when the
+    # file holds the rules already in use.
+    global _rules, _shared
+    start = time.perf_counter()
+    rules = make_rule_base(read_rules(path))
+    if rules.digest == _rules.digest:
+        return None
+    if BACKEND == "bitset":
+        import bitset_engine
+        compiled = bitset_engine.compile_rules(rules)
+        check_known_cases(lambda symptoms: compiled.stage(compiled.closure(compiled.to_state(symptoms))))
+        _rules = rules
+        elapsed = time.perf_counter() - start
+        return {"compile": elapsed, "save": 0.0, "swap": 0.0, "total": elapsed}
+
+    env = compile_rules(rules)
+    shared = (rules, env, env.find_function("screen"))
+    compiled = time.perf_counter()
+
+    try:
+        # sessions and other processes bload this image instead of compiling
+        path = rule_image.image_path("engine", rules.constructs)
+        rule_image.save_image(env, path)
+        rule_image.remove_stale_images("engine", path)
+    except (OSError, CLIPSError):
+        pass
+    saved = time.perf_counter()
+
+    with _swap_lock:
+        # the old environment is freed below, outside the timed swap
+        retired = _shared
+        _shared = shared
+        _rules = rules
+    swapped = time.perf_counter()
+    del retired
+
+    timings = {
+        "compile": compiled - start,
+        "save": saved - compiled,
+        "swap": swapped - saved,
+        "total": swapped - start
+    }
+    if metrics.enabled:
+        for name, seconds in timings.items():
+            metrics.record(f"rules.{name}", seconds)
+    return timings
+
+class RuleWatcher:
+    # Polls the rule file and reloads it when its mtime or size changes.
+    # A rejected file is reported on stderr and not retried until it
+    # changes again.
+
+    def __init__(self, path=RULES_PATH, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self.reloads = 0
+        self.last_timings = None
+        self.last_error = None
+        self._stamp = self._file_stamp()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rule-watcher", daemon=True)
+        self._thread.start()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def check(self):
+        # reload now if the file changed since the last check
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return
+        self._stamp = stamp
+        try:
+            timings = reload_rules(self.path)
+        except (OSError, ValueError, CLIPSError) as e:
+            self.last_error = str(e)
+            print(f"{self.path} rejected, keeping the current rules: {e}", file=sys.stderr)
+            return
+        self.last_error = None
+        if timings is not None:
+            self.reloads += 1
+            self.last_timings = timings
+            print(f"{self.path} reloaded: compiled in {timings['compile'] * 1000:.1f} ms, "
+                  f"swapped in {timings['swap'] * 1e6:.1f} us", file=sys.stderr)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+class DiagnosisSession:
+    # Keeps the selected symptoms as facts in a persistent environment.
+    # Toggling a symptom asserts or retracts only that fact and runs the
+    # agenda, so the cost does not depend on how many symptoms are selected.
+
+    def __init__(self):
+        self._selected = set()
+        self._result = "None"
+        self._start(_rules)
+
+    def _start(self, rules):
+        self.rules = rules
+        self.env = build_environment(rules)
+        self.env.reset()
+        self._add = self.env.find_function("add-symptom")
+        self._remove = self.env.find_function("remove-symptom")
+
+    def _follow_rules(self):
+        # after a reload the next call moves to the new rules, keeping the
+        # selected symptoms
+        if self.rules is _rules:
+            return
+        self._start(_rules)
+        self._result = "None"
+        for code in self._selected:
+            self._result = pick_stage(self._add(Symbol(code)))
+
+    def add(self, code):
+        self._follow_rules()
+        if code not in self._selected:
+            self._selected.add(code)
+            if metrics.enabled:
+                self._result = self._update_timed("engine.assert", "assert-symptoms", code)
+            else:
+                self._result = pick_stage(self._add(Symbol(code)))
+        return self._result
+
+    def remove(self, code):
+        self._follow_rules()
+        if code in self._selected:
+            self._selected.discard(code)
+            if metrics.enabled:
+                self._result = self._update_timed("engine.retract", "retract-symptom", code)
+            else:
+                self._result = pick_stage(self._remove(Symbol(code)))
+        return self._result
+
+    def _update_timed(self, name, function, code):
+        # add-symptom / remove-symptom split into timed steps
+        change = self.env.find_function(function)
+        diagnoses = self.env.find_function("diagnoses")
+        with metrics.phase(name):
+            change(Symbol(code))
+        with metrics.phase("engine.run"):
+            self.env.run()
+        with metrics.phase("engine.scan"):
+            return pick_stage(diagnoses())
+
+    def set(self, code, selected):
+        return self.add(code) if selected else self.remove(code)
+
+    def clear(self):
+        self._follow_rules()
+        self._selected.clear()
+        self._result = "None"
+        with metrics.phase("engine.reset"):
+            self.env.reset()
+
+    def symptoms(self):
+        return sorted(self._selected)
+
+    def result(self):
+        self._follow_rules()
+        return self._result
+
+if BACKEND == "bitset":
+    from bitset_engine import DiagnosisSession, diagnose, diagnose_detailed, diagnose_many
@@ -1,16 +1,12 @@
 import tkinter as tk
 from tkinter import messagebox
-from clips import Environment
-
-# ==============================
-# Initialize CLIPS Environment
-# ==============================
-env = Environment()
+import rule_image
 
 # ==============================
 # Define Templates
 # ==============================
-env.build("""
+CONSTRUCTS = [
+"""
 (deftemplate patient
    (slot age)
    (slot family-history)
@@ -18,18 +14,18 @@ env.build("""
    (slot recall-words)
    (slot confused-time)
    (slot daily-activities))
-""")
+""",
 
-env.build("""
+"""
 (deftemplate diagnosis
    (slot result)
    (slot explanation))
-""")
+""",
 
 # ==============================
 # Define Rules
 # ==============================
-env.build("""
+"""
 (defrule high-risk-alzheimers
    (patient
       (age ?a&:(>= ?a 65))
@@ -42,9 +38,9 @@ env.build("""
       (result "High Risk of Alzheimer’s Disease")
       (explanation
         "The patient is elderly and shows severe memory loss, confusion, and difficulty in daily activities."))))
-""")
+""",
 
-env.build("""
+"""
 (defrule moderate-risk-alzheimers
    (patient
       (forget-events yes)
@@ -55,9 +51,9 @@ env.build("""
       (result "Moderate Risk of Alzheimer’s Disease")
       (explanation
         "The patient shows multiple cognitive impairments associated with Alzheimer’s symptoms."))))
-""")
+""",
 
-env.build("""
+"""
 (defrule low-risk
    (patient
       (forget-events no)
@@ -68,7 +64,14 @@ env.build("""
       (result "Low Risk of Alzheimer’s Disease")
       (explanation
         "The patient shows minimal cognitive symptoms related to Alzheimer’s disease."))))
-""")
+""",
+]
+
+# ==============================
+# Initialize CLIPS Environment
+# ==============================
+# loads the saved binary image when the constructs are unchanged
+env = rule_image.load_or_build("example", CONSTRUCTS)
 
 # ==============================
 # Tkinter UI
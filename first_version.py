@@ -1,26 +1,25 @@
 import tkinter as tk
 import random
-from clips import Environment
+import rule_image
 from tkinter import messagebox
 
 # CLIPS EXPERT SYSTEM
-env = Environment()
-
-env.build("""
+CONSTRUCTS = [
+"""
 (deftemplate test1 (slot result))
-""")
+""",
 
-env.build("""
+"""
 (deftemplate test2 (slot result))
-""")
+""",
 
-env.build("""
+"""
 (deftemplate diagnosis
    (slot level)
    (slot recommendation))
-""")
+""",
 
-env.build("""
+"""
 (defrule high-risk
    (test1 (result poor))
    (test2 (result poor))
@@ -28,9 +27,9 @@ env.build("""
    (assert (diagnosis
       (level "High Risk of Alzheimer’s Disease")
       (recommendation "Strongly recommended to seek professional medical assessment."))))
-""")
+""",
 
-env.build("""
+"""
 (defrule moderate-risk
    (or
       (test1 (result moderate))
@@ -39,9 +38,9 @@ env.build("""
    (assert (diagnosis
       (level "Moderate Risk of Alzheimer’s Disease")
       (recommendation "Monitor memory health and consider professional screening."))))
-""")
+""",
 
-env.build("""
+"""
 (defrule low-risk
    (test1 (result good))
    (test2 (result good))
@@ -49,9 +48,9 @@ env.build("""
    (assert (diagnosis
       (level "Low Risk of Alzheimer’s Disease")
       (recommendation "No significant cognitive impairment detected."))))
-""")
+""",
 
-env.build("""
+"""
 (defrule mixed-risk
    (or
       (and (test1 (result good)) (test2 (result poor)))
@@ -61,7 +60,11 @@ env.build("""
       (level "Moderate Risk of Alzheimer’s Disease")
       (recommendation
         "One cognitive test indicates impairment. Further monitoring is recommended."))))
-""")
+""",
+]
+
+# loads the saved binary image when the constructs are unchanged
+env = rule_image.load_or_build("first_version", CONSTRUCTS)
 
 # GLOBAL RESULTS
 mcq_result = None
@@ -0,0 +1,144 @@
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+import rule_table
+from records import DATE_FORMAT, Record, format_record
+
+# Synthetic diagnosis_records.txt files for benchmarks and load tests.
+#
+#   python generate_records.py 1000000 -o records_1m.txt
+#   python generate_records.py 10000 --prevalence G017=0.2 --stage P003=0.2
+#
+# Every record first draws a disease stage from the stage mix. Symptoms
+# of that stage and of the milder ones are selected with probability
+# AFFECTED, all others with their background prevalence. The diagnosis
+# comes from the precompiled rule table, so the records are the ones the
+# app would have written. Dates run forward from --start over --days days.
+
+# background prevalence of each symptom
+PREVALENCE = {
+    "G001": 0.20,
+    "G002": 0.10,
+    "G004": 0.15,
+    "G005": 0.10,
+    "G007": 0.10,
+    "G008": 0.08,
+    "G009": 0.08,
+    "G011": 0.06,
+    "G012": 0.12,
+    "G014": 0.04,
+    "G015": 0.08,
+    "G017": 0.01,
+    "G018": 0.02,
+    "G020": 0.03,
+    "G021": 0.02
+}
+
+# share of records per stage, mildest first
+STAGE_MIX = {"None": 0.55, "P001": 0.25, "P002": 0.13, "P003": 0.07}
+
+# the selectable symptoms the rules of each stage look at
+STAGE_SYMPTOMS = {
+    "None": (),
+    "P001": ("G001", "G002", "G004", "G005"),
+    "P002": ("G007", "G008", "G009", "G011", "G012", "G014", "G015"),
+    "P003": ("G017", "G018", "G020", "G021")
+}
+
+AFFECTED = 0.85
+
+def stage_profiles(prevalence, affected):
+    # per stage: [(bit, probability)] over all selectable symptoms
+    profiles = {}
+    seen = set()
+    for stage, codes in STAGE_SYMPTOMS.items():
+        seen.update(codes)
+        profiles[stage] = [
+            (rule_table.BITS[code], affected if code in seen else prevalence[code])
+            for code in rule_table.CODES
+        ]
+    return profiles
+
+def generate(count, prevalence=None, stage_mix=None, start="2026-01-01", days=365,
+             seed=None, affected=AFFECTED):
+    # yields `count` Records in date order
+    prevalence = dict(PREVALENCE, **(prevalence or {}))
+    stage_mix = dict(STAGE_MIX, **(stage_mix or {}))
+    profiles = stage_profiles(prevalence, affected)
+    stages = list(stage_mix)
+    weights = [stage_mix[stage] for stage in stages]
+    table = rule_table.load_table()
+    rng = random.Random(seed)
+    moment = datetime.strptime(start, "%Y-%m-%d")
+    step = days * 86400 / max(count, 1)
+
+    for i in range(count):
+        mask = 0
+        for bit, p in profiles[rng.choices(stages, weights)[0]]:
+            if rng.random() < p:
+                mask |= bit
+        date = moment + timedelta(seconds=int(i * step))
+        yield Record(
+            date.strftime(DATE_FORMAT),
+            tuple(rule_table.mask_to_symptoms(mask)),
+            rule_table.RESULTS[table[mask]]
+        )
+
+def write_records(f, records, batch_size=10000):
+    batch = []
+    for record in records:
+        batch.append(format_record(record))
+        if len(batch) == batch_size:
+            f.write("".join(batch))
+            batch = []
+    f.write("".join(batch))
+
+def parse_shares(items, names):
+    # ["G017=0.2", ...] -> {"G017": 0.2}
+    shares = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        if name not in names:
+            raise ValueError(f"unknown code: {name}")
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"not a number: {item}") from None
+        if not 0 <= value <= 1:
+            raise ValueError(f"value must be between 0 and 1: {item}")
+        shares[name] = value
+    return shares
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic diagnosis record log.")
+    parser.add_argument("count", type=int, help="number of records")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--prevalence", action="append", default=[], metavar="CODE=P",
+                        help="background prevalence of one symptom, may be repeated")
+    parser.add_argument("--stage", action="append", default=[], metavar="STAGE=SHARE",
+                        help="share of records in one stage (None, P001, P002, P003)")
+    parser.add_argument("--affected", type=float, default=AFFECTED,
+                        help="probability of each symptom of the record's stage")
+    parser.add_argument("--start", default="2026-01-01", help="date of the first record")
+    parser.add_argument("--days", type=int, default=365, help="days the records span")
+    parser.add_argument("--seed", type=int, help="random seed for repeatable files")
+    args = parser.parse_args(argv)
+
+    try:
+        prevalence = parse_shares(args.prevalence, PREVALENCE)
+        stage_mix = parse_shares(args.stage, STAGE_MIX)
+    except ValueError as e:
+        parser.error(str(e))
+
+    records = generate(args.count, prevalence, stage_mix, args.start, args.days,
+                       args.seed, args.affected)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="\n") as f:
+            write_records(f, records)
+    else:
+        write_records(sys.stdout, records)
+
+if __name__ == "__main__":
+    main()
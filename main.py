@@ -1,148 +1,14 @@
 import tkinter as tk
 from tkinter import messagebox, scrolledtext, ttk
-from clips import Environment
-from datetime import datetime
-from collections import Counter
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-
-# CLIPS ENVIRONMENT
-env = Environment()
-
-env.build("""
-(deftemplate symptom (slot code))
-""")
-
-env.build("""
-(deftemplate diagnosis (slot result))
-""")
-
-# RULES (VALIDATED RULES)
-# ------------------------------Mild---------------------------------------------
-# Rule 1
-# IF G001: Memory decline 
-# AND G002: Looks confused in familiar places
-# THEN G003: Requires a long time to make decisions 
-env.build("""
-(defrule rule1
-   (symptom (code G001))
-   (symptom (code G002))
-   =>
-   (assert (symptom (code G003)))
-)
-""")
-
-# Rule 2
-# IF G003: Requires a long time to make decisions 
-# AND G004: Daily activities slower than usual 
-# AND G005: Loss of initiative
-# THEN G006: Personality changes begin to appear 
-env.build("""
-(defrule rule2
-   (symptom (code G003))
-   (symptom (code G004))
-   (symptom (code G005))
-   =>
-   (assert (symptom (code G006)))
-)
-""")
-
-# Rule 3
-# IF G006: Personality changes begin to appear
-# THEN P001: Alzheimer’s Dementia (Mild)
-env.build("""
-(defrule rule3
-   (symptom (code G006))
-   =>
-   (assert (diagnosis (result P001)))
-)
-""")
-
-# ------------------------------Moderate---------------------------------------------
-# Rule 4
-# IF G007: Memory is getting worse
-# AND G008: Difficulty thinking logically
-# AND G009: Difficulty reading, writing, counting
-# THEN G010: Easily forgets family members
-env.build("""
-(defrule rule4
-   (symptom (code G007))
-   (symptom (code G008))
-   (symptom (code G009))
-   =>
-   (assert (symptom (code G010)))
-)
-""")
-
-# Rule 5
-# IF G011: Cannot learn new things 
-# AND G012: Restless, anxious, sad (especially at night)
-# THEN G013: Repeats the same conversation 
-env.build("""
-(defrule rule5
-   (symptom (code G011))
-   (symptom (code G012))
-   =>
-   (assert (symptom (code G013)))
-)
-""")
-
-# Rule 6
-# IF G014: Repeats the same movements 
-# AND G015: Difficulty controlling emotions and behavior
-# THEN G016: Hallucinations 
-env.build("""
-(defrule rule6
-   (symptom (code G014))
-   (symptom (code G015))
-   =>
-   (assert (symptom (code G016)))
-)
-""")
-
-# Rule 7
-# IF G010: Forgets family members
-# AND G013: Repetitive speech
-# AND G016: Hallucinations
-# THEN P002: Alzheimer’s Ataxia (Moderate)
-env.build("""
-(defrule rule7
-   (symptom (code G010))
-   (symptom (code G013))
-   (symptom (code G016))
-   =>
-   (assert (diagnosis (result P002)))
-)
-""")
-
-# ------------------------------Acute---------------------------------------------
-# Rule 8
-# IF G017: Convulsions
-# AND G018: Difficulty swallowing food
-# THEN G019: Depression and weight loss
-env.build("""
-(defrule rule8
-   (symptom (code G017))
-   (symptom (code G018))
-   =>
-   (assert (symptom (code G019)))
-)
-""")
-
-# Rule 9
-# IF G019: Depression and weight loss
-# AND G020: Cannot communicate properly
-# AND G021: Cannot recognize close family members
-# THEN P003: Acute Alzheimer’s 
-env.build("""
-(defrule rule9
-   (symptom (code G019))
-   (symptom (code G020))
-   (symptom (code G021))
-   =>
-   (assert (diagnosis (result P003)))
-)
-""")
+import os
+import engine
+import metrics
+import records
+from credentials import CredentialStore, TooManyAttempts
+from record_writer import RecordWriter
+from record_view import VirtualRecordTable
+from symptom_index import FilteredRecords, SymptomIndex
+from task_runner import TaskRunner
 
 # main Window
 root = tk.Tk()
@@ -150,34 +16,109 @@ root.title("Rule-Based Alzheimer’s Expert System")
 root.geometry("900x700")
 root.configure(bg="#F4F6F8")
 
-# functions
-def save_diagnosis_to_file(selected_symptoms, diagnosis_result):
-    symptoms_text = ", ".join(selected_symptoms) if selected_symptoms else "-"
-    with open("diagnosis_records.txt", "a", encoding="utf-8") as file:
-        file.write("-------------------------------------------------------------\n")
-        file.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        file.write(f"Selected Symptoms: {symptoms_text}\n")
-        file.write(f"Diagnosis Result: {diagnosis_result}\n")
+# record storage: SQLite by default, set ALZ_RECORDS to a .txt path to keep
+# using the plain-text log
+RECORDS_PATH = os.environ.get("ALZ_RECORDS", "diagnosis_records.db")
+LEGACY_RECORDS_PATH = "diagnosis_records.txt"
 
-def diagnose():
-    env.reset()
-    selected_symptoms = []
+def open_record_store():
+    new_store = not os.path.exists(RECORDS_PATH)
+    store = records.open_records(RECORDS_PATH)
 
-    for code, var in symptom_vars.items():
-        if var.get():
-            env.assert_string(f"(symptom (code {code}))")
-            selected_symptoms.append(code)
+    # first start on SQLite: import the old text log once
+    if new_store and hasattr(store, "migrate_text_log") and os.path.exists(LEGACY_RECORDS_PATH):
+        store.migrate_text_log(LEGACY_RECORDS_PATH)
+    return store
 
-    env.run()
+# inference, store reads and chart rendering run on the task worker so
+# the window never waits on them; each page has its own task group
+busy_groups = set()
 
-    diagnoses = [
-        fact["result"]
-        for fact in env.facts()
-        if fact.template.name == "diagnosis"
-    ]
+def show_busy(group, busy):
+    if busy:
+        busy_groups.add(group)
+    else:
+        busy_groups.discard(group)
+    root.config(cursor="watch" if busy_groups else "")
+
+    # a label shared by several groups shows the first busy one
+    for label in {label for label, _ in BUSY_LABELS.values()}:
+        texts = [text for name, (shown_on, text) in BUSY_LABELS.items()
+                 if shown_on is label and name in busy_groups]
+        label.config(text=texts[0] if texts else "")
+
+tasks = TaskRunner(root, on_busy=show_busy)
+
+# opened on the task worker by finish_startup() once the first frame is
+# on screen; the store's SQLite connection and the CLIPS session are only
+# used from tasks after that
+record_store = None
+record_writer = None
+rule_watcher = None
+session = None
+startup_error = None    # message shown instead of saving or the admin pages
+
+def finish_startup():
+    # non-UI setup, deferred so the window appears first
+    root.update_idletasks()
+    tasks.submit("startup", start_services,
+                 on_done=lambda store: setattr(admin_view, "store", store),
+                 on_error=startup_failed)
+
+def startup_failed(error):
+    # nothing can be saved or listed: say so and turn those off
+    global startup_error
+    startup_error = f"Could not open the record store {RECORDS_PATH}:\n{error}"
+    run_diagnosis_button.config(state="disabled")
+    messagebox.showerror("Startup Error", startup_error)
+
+def records_available():
+    # False, with the startup error shown, if the store could not be opened
+    if startup_error is None:
+        return True
+    messagebox.showerror("Records Unavailable", startup_error)
+    return False
+
+def start_services():
+    global record_store, record_writer, rule_watcher
+    record_store = open_record_store()
+
+    # saves go through a background writer so the UI never waits on disk;
+    # it also keeps the filter bar's symptom index up to date
+    record_writer = RecordWriter(RECORDS_PATH, index=True)
+    get_session()
+
+    # edits to rules.clp take effect at the next diagnosis, no restart
+    rule_watcher = engine.RuleWatcher()
+    prepare_what_if()
+    return record_store
+
+def close_services():
+    if rule_watcher is not None:
+        rule_watcher.close()
+    if record_writer is not None:
+        record_writer.close()
+    if admin_index is not None:
+        admin_index.close()
+    if record_store is not None:
+        record_store.close()
+
+def get_session():
+    global session
+    if session is None:
+        session = engine.DiagnosisSession()
+    return session
 
-    if "P003" in diagnoses:
-        result_code = "P003"
+# functions
+def save_diagnosis_to_file(selected_symptoms, diagnosis_result):
+    # a save queued before startup failed ends up in save_failed()
+    if record_writer is None:
+        raise RuntimeError("the record store is not open")
+    with metrics.phase("ui.save"):
+        record_writer.submit(records.new_record(selected_symptoms, diagnosis_result))
+
+def show_result(result_code):
+    if result_code == "P003":
         msg = (
             "🟥 Diagnosis: Acute Alzheimer’s (P003)\n\n"
             "⚠️ Severe stage detected.\n"
@@ -185,8 +126,7 @@ def diagnose():
         )
         result_label.config(fg="#C0392B")
 
-    elif "P002" in diagnoses:
-        result_code = "P002"
+    elif result_code == "P002":
         msg = (
             "🟧 Diagnosis: Moderate Alzheimer’s (P002)\n\n"
             "⚠️ Symptoms indicate moderate cognitive decline.\n"
@@ -194,8 +134,7 @@ def diagnose():
         )
         result_label.config(fg="#D35400")
 
-    elif "P001" in diagnoses:
-        result_code = "P001"
+    elif result_code == "P001":
         msg = (
             "🟨 Diagnosis: Mild Alzheimer’s (P001)\n\n"
             "⚠️ Early-stage symptoms detected.\n"
@@ -204,7 +143,6 @@ def diagnose():
         result_label.config(fg="#B7950B")
 
     else:
-        result_code = "None"
         msg = (
             "🟩 No Alzheimer’s stage detected.\n\n"
             "Symptoms do not match the defined rules."
@@ -213,7 +151,67 @@ def diagnose():
 
     result_label.config(text=msg)
 
-    save_diagnosis_to_file(selected_symptoms, result_code)
+def show_diagnosis(result_code):
+    with metrics.phase("ui.update"):
+        show_result(result_code)
+
+# what-if panel: the fewest extra symptoms that would change the
+# diagnosis, worked out by what_if.py over every symptom combination.
+# numpy is imported on the worker at startup; without it, or for a rule
+# base it cannot evaluate, the panel stays empty
+def prepare_what_if():
+    try:
+        import what_if
+        what_if.prepare()
+    except (ImportError, ValueError):
+        pass
+
+def find_what_if(symptoms):
+    try:
+        import what_if
+        return what_if.what_if(symptoms)[1]
+    except (ImportError, ValueError):
+        return None
+
+def show_what_if(suggestions):
+    if not suggestions:
+        what_if_label.config(text="")
+        return
+    lines = ["What would change the diagnosis:"]
+    for s in suggestions:
+        names = "; ".join(engine.SYMPTOMS[code] for code in s.additions[0])
+        others = f" (or {len(s.additions) - 1} other ways)" if len(s.additions) > 1 else ""
+        lines.append(f"• {DIAGNOSIS_NAMES[s.stage]} ({s.stage}), add {s.count}{others}: {names}")
+    what_if_label.config(text="\n".join(lines))
+
+def toggle_symptom(code, selected):
+    result_code = get_session().set(code, selected)
+    return result_code, find_what_if(get_session().symptoms())
+
+def show_toggle_result(result):
+    result_code, suggestions = result
+    show_diagnosis(result_code)
+    show_what_if(suggestions)
+
+def on_symptom_toggle(code):
+    # live update: only the toggled symptom is asserted or retracted; the
+    # worker runs the toggles in click order
+    tasks.submit("diagnosis", toggle_symptom, code,
+                 symptom_vars[code].get(), on_done=show_toggle_result)
+
+def run_diagnosis():
+    # queued behind any toggles still running, so the saved result
+    # matches the ticked symptoms
+    result_code = get_session().result()
+    save_diagnosis_to_file(get_session().symptoms(), result_code)
+    return result_code
+
+def diagnose():
+    # a group of its own: leaving the page must not drop the save
+    tasks.submit("save", run_diagnosis, on_done=show_diagnosis, on_error=save_failed)
+
+def save_failed(error):
+    messagebox.showerror("Not Saved", f"The diagnosis was not saved:\n{error}")
 
 def reset_diagnosis_page():
     for var in symptom_vars.values():
@@ -223,49 +221,179 @@ def reset_diagnosis_page():
         text="No diagnosis yet.",
         fg="#34495E"
     )
+    what_if_label.config(text="")
 
-    env.reset()
+    tasks.cancel("diagnosis")
+    tasks.submit("diagnosis", lambda: get_session().clear())
 
-def show_pie_chart_page():
-    admin_records_page.pack_forget()
-    pie_chart_page.pack(fill="both", expand=True)
+DIAGNOSIS_NAMES = {
+    "P001": "Mild Alzheimer’s",
+    "P002": "Moderate Alzheimer’s",
+    "P003": "Acute Alzheimer’s",
+    "None": "No Alzheimer’s"
+}
 
-    for widget in pie_chart_frame.winfo_children():
-        widget.destroy()
+DIAGNOSIS_COLORS = {
+    "P001": "#B7950B",
+    "P002": "#D35400",
+    "P003": "#C0392B",
+    "None": "#27AE60"
+}
 
-    try:
-        with open("diagnosis_records.txt", "r", encoding="utf-8") as f:
-            results = [line.split(":")[-1].strip() for line in f if line.startswith("Diagnosis Result:")]
-    except FileNotFoundError:
-        messagebox.showwarning("No Data", "No records found.")
-        return
+# one renderer and one image for the pie chart, reused on every visit;
+# counts and the Agg render run as a task and only the finished PNG is
+# loaded on the Tk thread
+pie_renderer = None
+pie_image = None
+
+def render_pie(count):
+    # matplotlib is only imported on first use
+    global pie_renderer
+    with metrics.phase("chart.render"):
+        if pie_renderer is None:
+            from pie_chart import PieChartRenderer
+            pie_renderer = PieChartRenderer()
+        return pie_renderer.render_png(count, DIAGNOSIS_NAMES)
+
+def build_pie_chart():
+    with metrics.phase("chart.counts"):
+        count = record_store.diagnosis_counts()
+    return render_pie(count) if count else None
+
+def show_pie_chart_page():
+    leave_admin_records_page()
+    pie_chart_page.pack(fill="both", expand=True)
+    tasks.submit("chart", build_pie_chart, on_done=show_pie_image, replace=True)
 
-    if not results:
+def show_pie_image(data):
+    global pie_image
+    if data is None:
         messagebox.showwarning("No Data", "No diagnosis data available.")
         return
 
-    count = Counter(results)
-    labels, sizes = [], []
+    if pie_image is None:
+        pie_image = tk.PhotoImage(data=data)
+        pie_label.config(image=pie_image)
+    else:
+        pie_image.config(data=data)
+
+# analytics page: symptom co-occurrence and lift. The counts are kept up
+# to date incrementally by cooccurrence.py and saved next to the store;
+# while the page is open new records are picked up every few seconds, and
+# the chart is only re-rendered when there were some
+ANALYTICS_POLL_MS = 5000
+cooccurrence_stats = None
+analytics_renderer = None
+analytics_rendered = None   # (tables, png) of the last render
+analytics_image = None
+analytics_shown = None
+analytics_poll_job = None
+
+def build_analytics():
+    # numpy and matplotlib are only imported on first use
+    global cooccurrence_stats, analytics_renderer, analytics_rendered
+    with metrics.phase("analytics.refresh"):
+        if cooccurrence_stats is None:
+            from cooccurrence import CooccurrenceStats
+            cooccurrence_stats = CooccurrenceStats(record_store)
+        tables = cooccurrence_stats.tables()
+    if not tables.total:
+        return None
+    if analytics_rendered is None or analytics_rendered[0] is not tables:
+        with metrics.phase("analytics.render"):
+            if analytics_renderer is None:
+                from analytics_chart import AnalyticsRenderer
+                analytics_renderer = AnalyticsRenderer()
+            from cooccurrence import CODES, DIAGNOSES
+            analytics_rendered = (tables, analytics_renderer.render_png(tables, CODES, DIAGNOSES))
+    return analytics_rendered[1]
+
+def show_analytics_page():
+    leave_admin_records_page()
+    analytics_page.pack(fill="both", expand=True)
+    tasks.submit("analytics", build_analytics, replace=True,
+                 on_done=lambda data: show_analytics_image(data, warn=True))
+
+def poll_analytics():
+    global analytics_poll_job
+    analytics_poll_job = None
+    if analytics_page.winfo_manager():
+        if not tasks.busy("analytics"):
+            tasks.submit("analytics", build_analytics, on_done=show_analytics_image)
+        analytics_poll_job = root.after(ANALYTICS_POLL_MS, poll_analytics)
+
+def show_analytics_image(data, warn=False):
+    global analytics_image, analytics_shown, analytics_poll_job
+    if analytics_poll_job is None and analytics_page.winfo_manager():
+        analytics_poll_job = root.after(ANALYTICS_POLL_MS, poll_analytics)
+    if data is None:
+        if warn:
+            messagebox.showwarning("No Data", "No diagnosis data available.")
+        return
 
-    mapping = {
-        "P001": "Mild Alzheimer’s",
-        "P002": "Moderate Alzheimer’s",
-        "P003": "Acute Alzheimer’s",
-        "None": "No Alzheimer’s"
-    }
+    if data is analytics_shown:
+        return
+    analytics_shown = data
+    if analytics_image is None:
+        analytics_image = tk.PhotoImage(data=data)
+        analytics_label.config(image=analytics_image)
+    else:
+        analytics_image.config(data=data)
+
+def leave_analytics_page():
+    tasks.cancel("analytics")
+    analytics_page.pack_forget()
+
+def show_trend_page():
+    leave_admin_records_page()
+    trend_page.pack(fill="both", expand=True)
+    draw_trend_chart()
+
+# one renderer and one image for the trend chart, as for the pie chart
+trend_renderer = None
+trend_image = None
+
+def load_trend(period, start, end):
+    # read from the rollups only, the raw records are never touched;
+    # matplotlib is only imported on first use
+    global trend_renderer
+    with metrics.phase("trend.rollups"):
+        buckets = record_store.rollups(period, start, end)
+    if not buckets:
+        return None
+    with metrics.phase("trend.render"):
+        if trend_renderer is None:
+            from trend_chart import TrendChartRenderer
+            trend_renderer = TrendChartRenderer()
+        return trend_renderer.render_png(period, buckets, DIAGNOSIS_NAMES, DIAGNOSIS_COLORS)
+
+def draw_trend_chart():
+    period = "week" if trend_period.get() == "Weekly" else "day"
+    start = trend_from_entry.get().strip() or None
+    end = trend_to_entry.get().strip() or None
+
+    for value in (start, end):
+        if value and records.bucket(value, "day") is None:
+            messagebox.showerror("Invalid Date", "Please enter dates as YYYY-MM-DD.")
+            return
 
-    for k, v in count.items():
-        labels.append(f"{mapping[k]} ({k})")
-        sizes.append(v)
+    # "2026-2-1" is accepted above; the stores compare zero-padded dates
+    start = start and records.bucket(start, "day")
+    end = end and records.bucket(end, "day")
+    tasks.submit("trend", load_trend, period, start, end, on_done=show_trend_image, replace=True)
 
-    fig, ax = plt.subplots(figsize=(6,6))
-    ax.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90)
-    ax.axis("equal")
-    ax.set_title("Diagnosis Distribution")
+def show_trend_image(data):
+    global trend_image
+    if data is None:
+        trend_label.config(image="")
+        messagebox.showwarning("No Data", "No diagnosis data in this date range.")
+        return
 
-    canvas = FigureCanvasTkAgg(fig, master=pie_chart_frame)
-    canvas.draw()
-    canvas.get_tk_widget().pack(fill="both", expand=True)
+    if trend_image is None:
+        trend_image = tk.PhotoImage(data=data)
+    else:
+        trend_image.config(data=data)
+    trend_label.config(image=trend_image)
 
 # start page
 start_page = tk.Frame(root, bg="#F4F6F8")
@@ -328,28 +456,11 @@ canvas.pack(side="left", fill="both", expand=True, padx=(20, 0))
 scrollbar.pack(side="right", fill="y", padx=(0, 20))
 symptom_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
 
-symptoms = {
-    "G001": "Memory decline",
-    "G002": "Confused in familiar places",
-    "G004": "Daily activities slower than usual",
-    "G005": "Loss of initiative",
-    "G007": "Memory getting worse",
-    "G008": "Difficulty thinking logically",
-    "G009": "Difficulty reading / writing / counting",
-    "G011": "Cannot learn new things",
-    "G012": "Restless or anxious at night",
-    "G014": "Repeats same movements",
-    "G015": "Difficulty controlling emotions",
-    "G017": "Convulsions",
-    "G018": "Difficulty swallowing food",
-    "G020": "Cannot communicate properly",
-    "G021": "Cannot recognize close family members"
-}
-
 symptom_vars = {}
-for code, text in symptoms.items():
+for code, text in engine.SYMPTOMS.items():
     symptom_vars[code] = tk.BooleanVar()
     tk.Checkbutton(symptom_frame, text=text, variable=symptom_vars[code],
+                   command=lambda code=code: on_symptom_toggle(code),
                    bg="white", font=("Segoe UI", 12), anchor="w", padx=20).pack(fill="x", pady=4)
     
 # result display card
@@ -374,6 +485,20 @@ result_label = tk.Label(
 )
 result_label.pack(anchor="w", padx=20, pady=(0, 15))
 
+what_if_label = tk.Label(
+    result_card,
+    text="",
+    font=("Segoe UI", 10),
+    bg="white",
+    fg="#5D6D7E",
+    justify="left",
+    wraplength=700
+)
+what_if_label.pack(anchor="w", padx=20, pady=(0, 10))
+
+diagnosis_status = tk.Label(result_card, text="", font=("Segoe UI", 9), fg="gray", bg="white")
+diagnosis_status.pack(anchor="e", padx=20, pady=(0, 5))
+
 button_frame = tk.Frame(diagnosis_page, bg="#F4F6F8")
 button_frame.pack(pady=20)
 
@@ -392,7 +517,7 @@ tk.Button(
     )
 ).pack(side="left", padx=10)
 
-tk.Button(button_frame, 
+run_diagnosis_button = tk.Button(button_frame, 
           text="🔍 Run Diagnosis", 
           font=("Segoe UI", 14, "bold"),
           bg="#28B463", 
@@ -400,28 +525,38 @@ tk.Button(button_frame,
           padx=20, 
           pady=10, 
           command=diagnose
-).pack(side="left", padx=10)
+)
+run_diagnosis_button.pack(side="left", padx=10)
+
+credential_store = CredentialStore("admin.txt")
 
 def admin_login_check():
     email = admin_email_entry.get().strip()
     password = admin_password_entry.get().strip()
 
-    try:
-        with open("admin.txt", "r", encoding="utf-8") as f:
-            admins = [line.strip().split(",") for line in f if line.strip()]
-    except FileNotFoundError:
-        messagebox.showerror("Error", "Admin file not found.")
+    # the password hash is deliberately slow, so it runs as a task
+    tasks.submit("login", credential_store.check, email, password,
+                 on_done=admin_login_done, on_error=admin_login_failed, replace=True)
+
+def admin_login_done(ok):
+    if not ok:
+        messagebox.showerror("Failed", "Invalid email or password.")
         return
 
-    for admin_email, admin_pass in admins:
-        if email == admin_email and password == admin_pass:
-            messagebox.showinfo("Success", "Login successful!")
-            admin_login_page.pack_forget()
-            admin_records_page.pack(fill="both", expand=True)
-            load_admin_records()
-            return
+    admin_password_entry.delete(0, "end")
+    messagebox.showinfo("Success", "Login successful!")
+    if not records_available():
+        return
+    admin_login_page.pack_forget()
+    show_admin_records_page()
 
-    messagebox.showerror("Failed", "Invalid email or password.")
+def admin_login_failed(error):
+    if isinstance(error, FileNotFoundError):
+        messagebox.showerror("Error", "Admin file not found.")
+    elif isinstance(error, TooManyAttempts):
+        messagebox.showerror("Locked", f"Too many failed attempts. Try again in {error.retry_after:.0f} seconds.")
+    else:
+        raise error
 
 # admin login page
 admin_login_page = tk.Frame(root, bg="#F4F6F8")
@@ -528,6 +663,26 @@ tk.Label(
 admin_records_page = tk.Frame(root, bg="#F4F6F8")
 tk.Label(admin_records_page, text="Admin Records", font=("Segoe UI", 18, "bold")).pack(pady=10)
 
+filter_frame = tk.Frame(admin_records_page, bg="#F4F6F8")
+filter_frame.pack(padx=20, fill="x")
+
+tk.Label(filter_frame, text="Filter:", font=("Segoe UI", 10, "bold"), bg="#F4F6F8").pack(side="left")
+filter_entry = tk.Entry(filter_frame, font=("Segoe UI", 10), width=40)
+filter_entry.pack(side="left", padx=5, ipady=2)
+filter_entry.bind("<Return>", lambda e: apply_admin_filter())
+
+tk.Button(filter_frame, text="Apply", font=("Segoe UI", 10), bg="#5DADE2", fg="white",
+          command=lambda: apply_admin_filter()).pack(side="left", padx=(0, 5))
+tk.Button(filter_frame, text="Clear", font=("Segoe UI", 10), bg="#D5DBDB", fg="black",
+          command=lambda: clear_admin_filter()).pack(side="left")
+
+filter_status = tk.Label(filter_frame, text="e.g. G017 AND G018 AND NOT P003",
+                         font=("Segoe UI", 9), fg="gray", bg="#F4F6F8")
+filter_status.pack(side="left", padx=10)
+
+admin_status = tk.Label(filter_frame, text="", font=("Segoe UI", 9), fg="gray", bg="#F4F6F8")
+admin_status.pack(side="right")
+
 table_frame = tk.Frame(admin_records_page, bg="#F4F6F8")
 table_frame.pack(padx=20, pady=10, fill="both", expand=True)
 
@@ -569,44 +724,81 @@ admin_table.pack(side="left", fill="both", expand=True)
 
 scrollbar = ttk.Scrollbar(
     table_frame,
-    orient="vertical",
-    command=admin_table.yview
+    orient="vertical"
 )
-admin_table.configure(yscrollcommand=scrollbar.set)
 scrollbar.pack(side="right", fill="y")
 
-def load_admin_records():
-    for row in admin_table.get_children():
-        admin_table.delete(row)
+# only the visible rows live in admin_table, pages are read from the store
+admin_view = VirtualRecordTable(
+    admin_table,
+    scrollbar,
+    None,       # record_store, set once finish_startup() has opened it
+    lambda record: (record.date, records.symptoms_text(record.symptoms), record.diagnosis),
+    runner=tasks,
+    on_loaded=lambda view: show_filter_count()
+)
 
-    try:
-        with open("diagnosis_records.txt", "r", encoding="utf-8") as f:
-            lines = f.readlines()
-    except FileNotFoundError:
-        return
+admin_poll_job = None
+ADMIN_POLL_MS = 2000
 
-    date = ""
-    symptoms = ""
-    diagnosis = ""
+# symptom/diagnosis index behind the filter bar, built on first use
+admin_index = None
 
-    for line in lines:
-        line = line.strip()
+def build_admin_filter(text):
+    # runs as a task; the index reads the store on the worker
+    global admin_index
+    with metrics.phase("admin.filter"):
+        if admin_index is None:
+            admin_index = SymptomIndex(record_store)
+        return FilteredRecords(admin_index, text)
 
-        if line.startswith("Date:"):
-            date = line.replace("Date:", "").strip()
+def apply_admin_filter():
+    text = filter_entry.get().strip()
+    if not text:
+        clear_admin_filter()
+        return
+    tasks.submit("filter", build_admin_filter, text,
+                 on_done=admin_view.set_store, on_error=admin_filter_failed, replace=True)
 
-        elif line.startswith("Selected Symptoms:"):
-            symptoms = line.replace("Selected Symptoms:", "").strip()
+def admin_filter_failed(error):
+    if not isinstance(error, ValueError):
+        raise error
+    messagebox.showerror("Invalid Filter", str(error))
 
-        elif line.startswith("Diagnosis Result:"):
-            diagnosis = line.replace("Diagnosis Result:", "").strip()
+def show_filter_count():
+    if admin_view.store is not record_store:
+        filter_status.config(text=f"{admin_view.total} matching records")
 
-            # insert one complete row
-            admin_table.insert(
-                "",
-                "end",
-                values=(date, symptoms, diagnosis)
-            )
+def clear_admin_filter():
+    tasks.cancel("filter")
+    filter_entry.delete(0, "end")
+    filter_status.config(text="e.g. G017 AND G018 AND NOT P003")
+    admin_view.set_store(record_store)
+
+def load_admin_records():
+    # new records only change the row count, and the visible page if it
+    # is at the end; the reads run as a task
+    admin_view.refresh()
+
+def poll_admin_records():
+    # refresh while the records page is shown, stop once it is left
+    global admin_poll_job
+    admin_poll_job = None
+
+    if admin_records_page.winfo_manager():
+        load_admin_records()
+        admin_poll_job = root.after(ADMIN_POLL_MS, poll_admin_records)
+
+def show_admin_records_page():
+    admin_records_page.pack(fill="both", expand=True)
+    if admin_poll_job is None:
+        poll_admin_records()
+
+def leave_admin_records_page():
+    # reads nobody will see are dropped; polling stops by itself
+    admin_records_page.pack_forget()
+    admin_view.cancel()
+    tasks.cancel("filter")
 
 tk.Button(admin_records_page, 
           text="📊 View Pie Chart", 
@@ -616,12 +808,28 @@ tk.Button(admin_records_page,
           command=show_pie_chart_page
 ).pack(pady=10)
 
+tk.Button(admin_records_page, 
+          text="📈 View Trend", 
+          font=("Segoe UI", 12, "bold"),
+          bg="#5DADE2", 
+          fg="white", 
+          command=show_trend_page
+).pack(pady=(0, 10))
+
+tk.Button(admin_records_page, 
+          text="🔗 View Analytics", 
+          font=("Segoe UI", 12, "bold"),
+          bg="#5DADE2", 
+          fg="white", 
+          command=show_analytics_page
+).pack(pady=(0, 10))
+
 tk.Button(admin_records_page, 
           text="⬅ Back", 
           font=("Segoe UI", 12, "bold"),
           bg="#D5DBDB", 
           fg="black", 
-          command=lambda: (admin_records_page.pack_forget(), start_page.pack(fill="both", expand=True))
+          command=lambda: (leave_admin_records_page(), start_page.pack(fill="both", expand=True))
 ).pack()
 
 # pie chart page
@@ -629,8 +837,81 @@ pie_chart_page = tk.Frame(root, bg="#F4F6F8")
 pie_chart_frame = tk.Frame(pie_chart_page, bg="#F4F6F8")
 pie_chart_frame.pack(fill="both", expand=True)
 
+pie_status = tk.Label(pie_chart_frame, text="", font=("Segoe UI", 10), fg="gray", bg="#F4F6F8")
+pie_status.pack()
+pie_label = tk.Label(pie_chart_frame, bg="#F4F6F8")
+pie_label.pack(fill="both", expand=True)
+
 tk.Button(pie_chart_page, text="⬅ Back", font=("Segoe UI", 12, "bold"),
-          bg="#D5DBDB", fg="black", command=lambda: (pie_chart_page.pack_forget(), admin_records_page.pack(fill="both", expand=True))).pack(pady=10)
+          bg="#D5DBDB", fg="black", command=lambda: (tasks.cancel("chart"), pie_chart_page.pack_forget(), show_admin_records_page())).pack(pady=10)
+
+# trend chart page
+trend_page = tk.Frame(root, bg="#F4F6F8")
+
+trend_controls = tk.Frame(trend_page, bg="#F4F6F8")
+trend_controls.pack(pady=10)
+
+tk.Label(trend_controls, text="From (YYYY-MM-DD)", font=("Segoe UI", 10), bg="#F4F6F8").pack(side="left")
+trend_from_entry = tk.Entry(trend_controls, font=("Segoe UI", 10), width=12)
+trend_from_entry.pack(side="left", padx=(5, 15))
+
+tk.Label(trend_controls, text="To", font=("Segoe UI", 10), bg="#F4F6F8").pack(side="left")
+trend_to_entry = tk.Entry(trend_controls, font=("Segoe UI", 10), width=12)
+trend_to_entry.pack(side="left", padx=(5, 15))
+
+trend_period = ttk.Combobox(trend_controls, values=("Daily", "Weekly"), state="readonly", width=8)
+trend_period.set("Daily")
+trend_period.pack(side="left", padx=(0, 15))
+
+tk.Button(trend_controls, text="Show", font=("Segoe UI", 10, "bold"),
+          bg="#5DADE2", fg="white", command=draw_trend_chart).pack(side="left")
+
+trend_status = tk.Label(trend_controls, text="", font=("Segoe UI", 9), fg="gray", bg="#F4F6F8")
+trend_status.pack(side="left", padx=10)
+
+trend_chart_frame = tk.Frame(trend_page, bg="#F4F6F8")
+trend_chart_frame.pack(fill="both", expand=True)
+trend_label = tk.Label(trend_chart_frame, bg="#F4F6F8")
+trend_label.pack(fill="both", expand=True)
+
+tk.Button(trend_page, text="⬅ Back", font=("Segoe UI", 12, "bold"),
+          bg="#D5DBDB", fg="black", command=lambda: (tasks.cancel("trend"), trend_page.pack_forget(), show_admin_records_page())).pack(pady=10)
+
+# analytics page
+analytics_page = tk.Frame(root, bg="#F4F6F8")
+analytics_status = tk.Label(analytics_page, text="", font=("Segoe UI", 10), fg="gray", bg="#F4F6F8")
+analytics_status.pack()
+analytics_label = tk.Label(analytics_page, bg="#F4F6F8")
+analytics_label.pack(fill="both", expand=True)
+
+tk.Button(analytics_page, text="⬅ Back", font=("Segoe UI", 12, "bold"),
+          bg="#D5DBDB", fg="black", command=lambda: (leave_analytics_page(), show_admin_records_page())).pack(pady=10)
+
+# what show_busy() puts up while a task group has been running a while
+BUSY_LABELS = {
+    "diagnosis": (diagnosis_status, "Diagnosing..."),
+    "save": (diagnosis_status, "Saving..."),
+    "records": (admin_status, "Loading records..."),
+    "filter": (admin_status, "Filtering..."),
+    "chart": (pie_status, "Rendering chart..."),
+    "trend": (trend_status, "Loading..."),
+    "analytics": (analytics_status, "Counting symptoms...")
+}
+
+# with ALZ_METRICS set, write the phase timings out every half minute
+METRICS_WRITE_MS = 30000
+
+def write_metrics():
+    metrics.write()
+    root.after(METRICS_WRITE_MS, write_metrics)
 
 # run the user interface
-root.mainloop()
\ No newline at end of file
+root.after_idle(finish_startup)
+if metrics.enabled:
+    root.after(METRICS_WRITE_MS, write_metrics)
+root.mainloop()
+
+# drop unfinished page work but let queued saves (and the toggles queued
+# before them) run, then write out anything still queued and close the
+# store on the worker thread that opened it
+tasks.shutdown(last=close_services, keep=("diagnosis", "save"))
\ No newline at end of file
@@ -0,0 +1,157 @@
+import atexit
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+# Opt-in timing of the diagnosis and admin phases.
+#
+#   ALZ_METRICS=metrics.json python main.py     # p50/p95/p99 per phase as JSON
+#   ALZ_METRICS=metrics.prom python main.py     # Prometheus text format
+#   python metrics.py metrics.json              # print a saved file
+#
+# Code wraps each phase in `with metrics.phase("engine.run"):`. While
+# metrics are off phase() returns one shared no-op context, and the engine
+# checks `metrics.enabled` before taking its step-by-step path, so the
+# disabled cost is a function call per phase. Every phase gets a
+# histogram with fixed log-spaced buckets (a quarter octave wide, 1 us to
+# about 100 s); percentiles are interpolated inside the bucket.
+
+enabled = False
+path = None
+
+BUCKETS = tuple(1e-6 * 2 ** (i / 4) for i in range(108))
+PERCENTILES = (50, 95, 99)
+
+_NOOP = nullcontext()
+_histograms = {}
+_lock = threading.Lock()
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)     # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        summary = {"count": self.count, "sum": self.sum, "max": self.max}
+        for p in PERCENTILES:
+            summary[f"p{p}"] = self.percentile(p)
+        return summary
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+
+def phase(name):
+    return _Phase(name) if enabled else _NOOP
+
+def record(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+def enable(metrics_path=None):
+    # start collecting; the file (if any) is also written at exit
+    global enabled, path
+    if metrics_path and path is None:
+        atexit.register(write)
+    enabled = True
+    path = metrics_path or path
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+def snapshot():
+    with _lock:
+        return {name: histogram.summary() for name, histogram in sorted(_histograms.items())}
+
+def prometheus_text():
+    lines = [
+        "# HELP alz_phase_seconds Time spent in each phase of the screening app.",
+        "# TYPE alz_phase_seconds histogram"
+    ]
+    with _lock:
+        for name, histogram in sorted(_histograms.items()):
+            label = f'phase="{name}"'
+            # only the buckets from the first to the last one with samples
+            used = [i for i, n in enumerate(histogram.counts[:-1]) if n]
+            cumulative = 0
+            for i in range(used[0], used[-1] + 1) if used else ():
+                cumulative += histogram.counts[i]
+                lines.append(f'alz_phase_seconds_bucket{{{label},le="{BUCKETS[i]:.6g}"}} {cumulative}')
+            lines.append(f'alz_phase_seconds_bucket{{{label},le="+Inf"}} {histogram.count}')
+            lines.append(f"alz_phase_seconds_sum{{{label}}} {histogram.sum:.9g}")
+            lines.append(f"alz_phase_seconds_count{{{label}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+def write(metrics_path=None):
+    # .prom files get the Prometheus text format, anything else JSON
+    metrics_path = metrics_path or path
+    if not metrics_path:
+        return
+    if metrics_path.endswith(".prom"):
+        data = prometheus_text()
+    else:
+        data = json.dumps({"written": time.time(), "phases": snapshot()}, indent=2)
+
+    tmp_path = metrics_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp_path, metrics_path)
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.3f}"
+
+def print_summary(phases, out=sys.stdout):
+    out.write(f"{'phase':22s} {'count':>8s} {'p50 ms':>10s} {'p95 ms':>10s} {'p99 ms':>10s} {'max ms':>10s}\n")
+    for name, s in phases.items():
+        out.write(f"{name:22s} {s['count']:8d} {format_ms(s['p50']):>10s} {format_ms(s['p95']):>10s} "
+                  f"{format_ms(s['p99']):>10s} {format_ms(s['max']):>10s}\n")
+
+if os.environ.get("ALZ_METRICS"):
+    enable(os.environ["ALZ_METRICS"])
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python metrics.py metrics.json")
+    with open(sys.argv[1], encoding="utf-8") as f:
+        print_summary(json.load(f)["phases"])
@@ -0,0 +1,53 @@
+import base64
+import io
+import sys
+import threading
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Pie chart for the admin page. One Figure and one Agg canvas are created
+# once and redrawn in place, outside pyplot, so nothing piles up between
+# refreshes. render_png() may run on a worker thread; the Tk side only
+# loads the finished image.
+
+class PieChartRenderer:
+    def __init__(self, size=(6, 6), dpi=100):
+        self.figure = Figure(figsize=size, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self._lock = threading.Lock()
+
+    def render_png(self, counts, names):
+        # base64 PNG, ready for tk.PhotoImage(data=...)
+        with self._lock:
+            labels, sizes = [], []
+            for k, v in counts.items():
+                labels.append(f"{names.get(k, k)} ({k})")
+                sizes.append(v)
+
+            self.ax.clear()
+            self.ax.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90)
+            self.ax.axis("equal")
+            self.ax.set_title("Diagnosis Distribution")
+
+            buf = io.BytesIO()
+            self.canvas.print_png(buf)
+            return base64.b64encode(buf.getvalue()).decode("ascii")
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:     # Windows
+        return float("nan")
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+if __name__ == "__main__":
+    # soak test: python pie_chart.py [refreshes]
+    refreshes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    names = {"P001": "Mild", "P002": "Moderate", "P003": "Acute", "None": "None"}
+    renderer = PieChartRenderer()
+    for i in range(1, refreshes + 1):
+        renderer.render_png({"P001": i % 7 + 1, "P002": i % 5 + 1, "P003": i % 3 + 1, "None": 10}, names)
+        if i % 500 == 0:
+            print(f"{i:6d} refreshes  peak RSS {peak_rss_mb():.1f} MB", flush=True)
@@ -0,0 +1,228 @@
+import sqlite3
+import sys
+from collections import Counter
+from records import Record, TextRecordLog, bucket, parse_symptoms
+
+# SQLite record store. One row per diagnosis in `records`, the selected
+# symptoms normalized into `record_symptoms`. WAL mode lets the admin
+# pages read while a kiosk is writing.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    diagnosis TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS record_symptoms (
+    record_id INTEGER NOT NULL REFERENCES records(id),
+    code TEXT NOT NULL,
+    PRIMARY KEY (record_id, code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_records_timestamp ON records(timestamp);
+CREATE INDEX IF NOT EXISTS idx_records_diagnosis ON records(diagnosis);
+CREATE INDEX IF NOT EXISTS idx_record_symptoms_code ON record_symptoms(code, record_id);
+"""
+
+# Running per-diagnosis counts for the pie chart, kept up to date by
+# triggers so every writer (including outside tools) maintains them.
+COUNTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS diagnosis_counts (
+    diagnosis TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS records_count_insert AFTER INSERT ON records
+BEGIN
+    INSERT INTO diagnosis_counts (diagnosis, count) VALUES (new.diagnosis, 1)
+    ON CONFLICT (diagnosis) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS records_count_delete AFTER DELETE ON records
+BEGIN
+    UPDATE diagnosis_counts SET count = count - 1 WHERE diagnosis = old.diagnosis;
+END;
+"""
+
+# Per-day and per-week counts for the trend chart, same idea. A week is
+# keyed by the date of its Monday. Records without a usable date are left
+# out, as in the text log's counts. The triggers are recreated on every
+# open so databases made with older versions get the current ones.
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_counts (
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    diagnosis TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (period, bucket, diagnosis)
+) WITHOUT ROWID;
+DROP TRIGGER IF EXISTS records_rollup_insert;
+CREATE TRIGGER records_rollup_insert AFTER INSERT ON records
+WHEN date(new.timestamp) IS NOT NULL
+BEGIN
+    INSERT INTO rollup_counts (period, bucket, diagnosis, count)
+    VALUES ('day', date(new.timestamp), new.diagnosis, 1),
+           ('week', date(new.timestamp, '-6 days', 'weekday 1'), new.diagnosis, 1)
+    ON CONFLICT (period, bucket, diagnosis) DO UPDATE SET count = count + 1;
+END;
+DROP TRIGGER IF EXISTS records_rollup_delete;
+CREATE TRIGGER records_rollup_delete AFTER DELETE ON records
+WHEN date(old.timestamp) IS NOT NULL
+BEGIN
+    UPDATE rollup_counts SET count = count - 1
+    WHERE diagnosis = old.diagnosis
+      AND ((period = 'day' AND bucket = date(old.timestamp))
+        OR (period = 'week' AND bucket = date(old.timestamp, '-6 days', 'weekday 1')));
+END;
+"""
+
+class SqliteRecordStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._create_counts()
+
+    def _table_exists(self, name):
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone() is not None
+
+    def _create_counts(self):
+        # tables added after the first release are filled once from records
+        with self.conn:
+            exists = self._table_exists("diagnosis_counts")
+            self.conn.executescript(COUNTS_SCHEMA)
+            if not exists:
+                self.conn.execute("""
+                    INSERT INTO diagnosis_counts (diagnosis, count)
+                    SELECT diagnosis, count(*) FROM records GROUP BY diagnosis
+                """)
+
+            exists = self._table_exists("rollup_counts")
+            self.conn.executescript(ROLLUP_SCHEMA)
+            if not exists:
+                self.conn.execute("""
+                    INSERT INTO rollup_counts (period, bucket, diagnosis, count)
+                    SELECT 'day', date(timestamp), diagnosis, count(*)
+                    FROM records WHERE date(timestamp) IS NOT NULL
+                    GROUP BY 1, 2, 3
+                    UNION ALL
+                    SELECT 'week', date(timestamp, '-6 days', 'weekday 1'), diagnosis, count(*)
+                    FROM records WHERE date(timestamp) IS NOT NULL
+                    GROUP BY 1, 2, 3
+                """)
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        with self.conn:
+            for record in records:
+                cur = self.conn.execute(
+                    "INSERT INTO records (timestamp, diagnosis) VALUES (?, ?)",
+                    (record.date, record.diagnosis)
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO record_symptoms (record_id, code) VALUES (?, ?)",
+                    [(cur.lastrowid, code) for code in record.symptoms]
+                )
+
+    def sync(self):
+        # copy the WAL into the database file and fsync it
+        self.conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def records(self):
+        for record, _ in self.read_since(None):
+            yield record
+
+    def read_since(self, checkpoint):
+        # checkpoint is the id of the last record already seen
+        rows = self.conn.execute("""
+            SELECT r.id, r.timestamp, group_concat(s.code, ', '), r.diagnosis
+            FROM records r
+            LEFT JOIN record_symptoms s ON s.record_id = r.id
+            WHERE r.id > ?
+            GROUP BY r.id
+            ORDER BY r.id
+        """, (checkpoint or 0,))
+        for record_id, date, codes, diagnosis in rows:
+            yield Record(date, parse_symptoms(codes or ""), diagnosis), record_id
+
+    def page(self, start, limit):
+        # records [start, start + limit) by position, for the paged table
+        rows = self.conn.execute("""
+            SELECT r.timestamp,
+                   (SELECT group_concat(code, ', ') FROM record_symptoms WHERE record_id = r.id),
+                   r.diagnosis
+            FROM records r
+            ORDER BY r.id
+            LIMIT ? OFFSET ?
+        """, (limit, start))
+        return [Record(date, parse_symptoms(codes or ""), diagnosis) for date, codes, diagnosis in rows]
+
+    def records_at(self, positions):
+        # records at the given sorted positions
+        if not positions:
+            return []
+        last = self.conn.execute("SELECT max(id) FROM records").fetchone()[0]
+        if last != self.count():
+            # ids have gaps, go by position
+            return [record for position in positions for record in self.page(position, 1)]
+
+        # no deletes, so the record at position p has id p + 1
+        rows = self.conn.execute(f"""
+            SELECT r.timestamp,
+                   (SELECT group_concat(code, ', ') FROM record_symptoms WHERE record_id = r.id),
+                   r.diagnosis
+            FROM records r
+            WHERE r.id IN ({", ".join("?" * len(positions))})
+            ORDER BY r.id
+        """, [position + 1 for position in positions])
+        return [Record(date, parse_symptoms(codes or ""), diagnosis) for date, codes, diagnosis in rows]
+
+    def checkpoint_valid(self, checkpoint):
+        last = self.conn.execute("SELECT max(id) FROM records").fetchone()[0]
+        return (checkpoint or 0) <= (last or 0)
+
+    def count(self):
+        return self.conn.execute("SELECT coalesce(sum(count), 0) FROM diagnosis_counts").fetchone()[0]
+
+    def diagnosis_counts(self):
+        rows = self.conn.execute("SELECT diagnosis, count FROM diagnosis_counts WHERE count > 0")
+        return Counter(dict(rows))
+
+    def rollups(self, period, start=None, end=None):
+        # sorted (bucket, Counter) pairs, read from rollup_counts only
+        if start:
+            start = bucket(start, period)
+        if end:
+            end = bucket(end, "day")
+        rows = self.conn.execute("""
+            SELECT bucket, diagnosis, count FROM rollup_counts
+            WHERE period = ? AND bucket >= ? AND bucket <= ? AND count > 0
+            ORDER BY bucket
+        """, (period, start or "", end or "9999-12-31"))
+
+        result = []
+        for key, diagnosis, count in rows:
+            if not result or result[-1][0] != key:
+                result.append((key, Counter()))
+            result[-1][1][diagnosis] = count
+        return result
+
+    def migrate_text_log(self, path):
+        # one-shot import of an existing diagnosis_records.txt
+        before = self.count()
+        self.append_many(TextRecordLog(path).records())
+        return self.count() - before
+
+    def close(self):
+        self.conn.close()
+
+if __name__ == "__main__":
+    # python record_store.py diagnosis_records.txt diagnosis_records.db
+    if len(sys.argv) != 3:
+        sys.exit("usage: python record_store.py <records.txt> <records.db>")
+    store = SqliteRecordStore(sys.argv[2])
+    print(f"migrated {store.migrate_text_log(sys.argv[1])} records into {sys.argv[2]}")
+    store.close()
@@ -0,0 +1,171 @@
+from tkinter import ttk
+import metrics
+
+# Virtualized records table. The Treeview only ever holds the rows that
+# are on screen; the scrollbar is driven by hand so its position and size
+# still reflect the whole store. Rows come from store.page(start, limit)
+# and a window of `overscan` rows around the visible ones is kept cached
+# so scrolling a few rows does not go back to the store.
+#
+# With a TaskRunner the count and pages are read on its worker (task
+# group "records") and the rows are drawn when they arrive; without one
+# they are read inline. on_loaded(table) is called after each read.
+
+class VirtualRecordTable:
+    TASK_GROUP = "records"
+
+    def __init__(self, tree, scrollbar, store, row_values, overscan=100, runner=None,
+                 on_loaded=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.store = store
+        self.row_values = row_values
+        self.overscan = overscan
+        self.runner = runner
+        self.on_loaded = on_loaded
+        self.total = 0
+        self.first = 0
+        self._cache_start = 0
+        self._cache = []
+        self._loading = False
+        self._reload = False
+
+        scrollbar.configure(command=self.yview)
+        tree.configure(yscrollcommand=lambda *args: None)
+        tree.bind("<Configure>", lambda e: self.render())
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+        tree.bind("<Button-5>", lambda e: self.scroll_rows(3))
+        tree.bind("<Prior>", lambda e: self.scroll_rows(-self.visible_rows()))
+        tree.bind("<Next>", lambda e: self.scroll_rows(self.visible_rows()))
+        tree.bind("<Home>", lambda e: self.scroll_to(0))
+        tree.bind("<End>", lambda e: self.scroll_to(self.total))
+
+    def set_store(self, store):
+        # show another record source (e.g. a filtered view) from the top
+        if self.runner is not None:
+            self.runner.cancel(self.TASK_GROUP)
+        self.store = store
+        self.total = 0
+        self.first = 0
+        self._cache = []
+        self._loading = False
+        self._reload = False
+        self.refresh()
+
+    def cancel(self):
+        # drop outstanding reads, e.g. when the page is left
+        if self.runner is not None:
+            self.runner.cancel(self.TASK_GROUP)
+        self._loading = False
+        self._reload = False
+
+    def visible_rows(self):
+        rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return int(self.tree.cget("height"))
+        # one row's worth of space goes to the headings
+        return max(1, height // rowheight - 1)
+
+    def refresh(self):
+        # pick up records added since the last refresh
+        if self.store is None:
+            return
+        if self._loading:
+            self._reload = True
+            return
+
+        visible = self.visible_rows()
+        # a view already showing the last row follows new rows
+        at_end = self.total > 0 and self.first + visible >= self.total
+        args = (self.store, self.first, visible, at_end, self.total,
+                self._cache_start, len(self._cache))
+        if self.runner is None:
+            self._loaded(self._read(*args))
+        else:
+            self._loading = True
+            self.runner.submit(self.TASK_GROUP, self._read, *args,
+                               on_done=self._loaded, on_error=self._failed)
+
+    def _read(self, store, first, visible, at_end, old_total, cache_start, cache_len):
+        # runs on the worker: the row count, plus the rows around `first`
+        # unless the cached ones are still good
+        with metrics.phase("view.read"):
+            return self._read_rows(store, first, visible, at_end, old_total, cache_start, cache_len)
+
+    def _read_rows(self, store, first, visible, at_end, old_total, cache_start, cache_len):
+        total = store.count()
+        if at_end and total != old_total:
+            first = max(0, total - visible)
+        first = max(0, min(first, total - visible))
+
+        cache_end = cache_start + cache_len
+        covered = cache_start <= first and min(first + visible, total) <= cache_end
+        # rows cached up to the old end may have been followed by new ones
+        if covered and (total == old_total or (total > old_total and cache_end < old_total)):
+            return store, total, at_end, first, None, None
+
+        start = max(0, first - self.overscan)
+        return store, total, at_end, first, start, store.page(start, visible + 2 * self.overscan)
+
+    def _loaded(self, result):
+        store, total, at_end, first, start, rows = result
+        self._loading = False
+        if store is not self.store:
+            return
+        self.total = total
+        if at_end:
+            self.first = first
+        if rows is not None:
+            self._cache_start = start
+            self._cache = rows
+        self.render()
+        if self.on_loaded:
+            self.on_loaded(self)
+
+        if self._reload:
+            self._reload = False
+            self.refresh()
+
+    def _failed(self, error):
+        self._loading = False
+        self._reload = False
+        raise error
+
+    def render(self):
+        visible = self.visible_rows()
+        self.first = max(0, min(self.first, self.total - visible))
+        end = min(self.first + visible, self.total)
+
+        if self.total:
+            self.scrollbar.set(self.first / self.total, min(1.0, (self.first + visible) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+        if self.first < self._cache_start or end > self._cache_start + len(self._cache):
+            # not read yet: keep the old rows until the page arrives
+            self.refresh()
+            return
+
+        self.tree.delete(*self.tree.get_children())
+        for record in self._cache[self.first - self._cache_start:end - self._cache_start]:
+            self.tree.insert("", "end", values=self.row_values(record))
+
+    def scroll_to(self, first):
+        self.first = int(first)
+        self.render()
+
+    def scroll_rows(self, rows):
+        self.scroll_to(self.first + rows)
+
+    def yview(self, *args):
+        # scrollbar callback: ("moveto", fraction) or ("scroll", n, "units"|"pages")
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.total)
+        elif args[0] == "scroll":
+            step = self.visible_rows() if args[2] == "pages" else 1
+            self.scroll_rows(int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        self.scroll_rows(-3 if event.delta > 0 else 3)
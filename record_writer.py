@@ -0,0 +1,137 @@
+import queue
+import sys
+import threading
+import time
+import traceback
+import metrics
+import records
+
+# Background writer for diagnosis records. submit() only puts the record
+# on a bounded queue; a daemon thread drains it and writes whatever has
+# piled up as one group commit (one transaction / one write call).
+#
+# fsync policy:
+#   "commit"   - sync after every group commit
+#   "interval" - sync at most every sync_interval seconds
+#   "never"    - leave it to the OS / SQLite
+#
+# With index=True the symptom index (<store>.symidx) is brought up to date
+# after every group commit, so the admin filter finds it current.
+
+FSYNC_POLICIES = ("commit", "interval", "never")
+
+_STOP = object()
+
+class RecordWriter:
+    def __init__(self, path, max_queue=10000, batch_size=500, fsync="interval", sync_interval=1.0,
+                 index=False):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.sync_interval = sync_interval
+        self.index = index
+        self.written = 0
+        self.commits = 0
+        self.errors = 0
+        self._queue = queue.Queue(max_queue)
+        self._ready = threading.Event()
+        self._open_error = None
+        self._thread = threading.Thread(target=self._run, name="record-writer", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._open_error is not None:
+            # the thread has already exited
+            raise self._open_error
+
+    def submit(self, record, block=True, timeout=None):
+        # blocks only when max_queue records are already waiting
+        if not self._thread.is_alive():
+            raise RuntimeError("record writer is closed")
+        self._queue.put(record, block, timeout)
+
+    def flush(self):
+        # wait until everything submitted so far is written
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _next(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        # the store is opened on this thread (SQLite connections are per thread);
+        # if that fails, __init__ raises the error instead of waiting forever
+        try:
+            store = records.open_records(self.path)
+        except Exception as e:
+            self._open_error = e
+            return
+        finally:
+            self._ready.set()
+        index = None
+        last_sync = time.monotonic()
+        unsynced = False
+        stopping = False
+
+        try:
+            while not stopping:
+                timeout = None
+                if unsynced and self.fsync == "interval":
+                    timeout = max(0.0, last_sync + self.sync_interval - time.monotonic())
+
+                batch = []
+                item = self._next(timeout)
+                while item is not None:
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                try:
+                    if batch:
+                        with metrics.phase("records.write"):
+                            store.append_many(batch)
+                        self.written += len(batch)
+                        self.commits += 1
+                        unsynced = True
+                        if self.index:
+                            # loaded on the first commit, not at startup
+                            with metrics.phase("records.index"):
+                                if index is None:
+                                    from symptom_index import SymptomIndex
+                                    index = SymptomIndex(store)
+                                index.refresh()
+
+                    now = time.monotonic()
+                    due = self.fsync == "commit" or (
+                        self.fsync == "interval" and (stopping or now - last_sync >= self.sync_interval)
+                    )
+                    if unsynced and due:
+                        with metrics.phase("records.sync"):
+                            store.sync()
+                        last_sync = now
+                        unsynced = False
+                except Exception:
+                    self.errors += 1
+                    traceback.print_exc(file=sys.stderr)
+                finally:
+                    for _ in range(len(batch) + stopping):
+                        self._queue.task_done()
+        finally:
+            if index is not None:
+                index.close()
+            store.close()
@@ -0,0 +1,396 @@
+import gzip
+import json
+import os
+import threading
+import time
+from array import array
+from itertools import islice
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+# Diagnosis records and the plain-text record log.
+#
+# The text log is the original diagnosis_records.txt format:
+#   -------------------------------------------------------------
+#   Date: 2026-01-10 12:07:04
+#   Selected Symptoms: G001, G002, G004, G005
+#   Diagnosis Result: P001
+#
+# Several processes may append to one log. Each batch of records is
+# encoded into one buffer and written with a single O_APPEND write while
+# holding an advisory lock on <log>.lock, so records never interleave. A
+# writer that dies mid-write leaves a torn record without its final
+# newline; the next record's separator then ends up on the same line,
+# which the parser recognises, and the torn record is skipped.
+
+Record = namedtuple("Record", ["date", "symptoms", "diagnosis"])
+
+SEPARATOR = "-------------------------------------------------------------"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def new_record(symptoms, diagnosis, date=None):
+    date = date or datetime.now().strftime(DATE_FORMAT)
+    return Record(date, tuple(symptoms), diagnosis)
+
+def symptoms_text(symptoms):
+    return ", ".join(symptoms) if symptoms else "-"
+
+def parse_symptoms(text):
+    text = text.strip()
+    if not text or text == "-":
+        return ()
+    return tuple(code.strip() for code in text.split(",") if code.strip())
+
+# rollup buckets: "day" is the date, "week" the date of its Monday
+PERIODS = ("day", "week")
+
+def bucket(date, period):
+    return _bucket(date[:10], period)
+
+# strptime is slow and a log has few distinct days
+@lru_cache(maxsize=4096)
+def _bucket(day_text, period):
+    try:
+        day = datetime.strptime(day_text, "%Y-%m-%d")
+    except ValueError:
+        return None
+    if period == "week":
+        day -= timedelta(days=day.weekday())
+    return day.strftime("%Y-%m-%d")
+
+def select_buckets(rollup, period, start=None, end=None):
+    # sorted (bucket, Counter) pairs between the dates start and end
+    if start:
+        start = bucket(start, period)
+    if end:
+        end = bucket(end, "day")
+    return [
+        (key, Counter(rollup[key]))
+        for key in sorted(rollup)
+        if (not start or key >= start) and (not end or key <= end)
+    ]
+
+def format_record(record):
+    return (
+        f"{SEPARATOR}\n"
+        f"Date: {record.date}\n"
+        f"Selected Symptoms: {symptoms_text(record.symptoms)}\n"
+        f"Diagnosis Result: {record.diagnosis}\n"
+    )
+
+def read_records(path, offset=0):
+    # The one parser for the text log, shared by the admin table and the
+    # chart counts. Yields (record, end_offset) for every complete record
+    # after offset; end_offset is the checkpoint to resume from. A record
+    # is complete once its "Diagnosis Result:" line has its newline, so a
+    # half-written record at the end is left for the next read. Offsets in
+    # a .gz file are offsets into its uncompressed text.
+    with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as f:
+        f.seek(offset)
+        yield from parse_records(f, offset)
+
+def parse_records(f, offset=0):
+    # read_records() over a binary file object positioned at offset
+    date = ""
+    symptoms = ()
+    for raw in f:
+        offset += len(raw)
+        if not raw.endswith(b"\n"):
+            return
+        line = raw.decode("utf-8", "replace").strip()
+
+        if line.endswith(SEPARATOR):
+            # a new record; anything before the separator on the same line
+            # is the tail of a torn one
+            date = ""
+            symptoms = ()
+
+        elif line.startswith("Date:"):
+            date = line.replace("Date:", "").strip()
+
+        elif line.startswith("Selected Symptoms:"):
+            symptoms = parse_symptoms(line.replace("Selected Symptoms:", ""))
+
+        elif line.startswith("Diagnosis Result:"):
+            yield Record(date, symptoms, line.replace("Diagnosis Result:", "").strip()), offset
+
+def temp_path(path):
+    # temp file for a write-then-rename of path; unique per process and
+    # thread, as several threads may save the same file at once
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+class LogCounts:
+    # Running per-diagnosis counts (all-time, per day and per week) for a
+    # text log, saved next to it as <log>.counts.json together with the
+    # byte offset they cover and the log's size and mtime at that point.
+    # An unchanged log is answered from the file alone; a grown log only
+    # has its new tail parsed. The file is a cache, so it is written at
+    # most every SAVE_INTERVAL seconds and on flush(); if it falls behind,
+    # the next reader just parses a longer tail.
+    SAVE_INTERVAL = 1.0
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.path = log_path + ".counts.json"
+        self.offset = 0
+        self.size = 0
+        self.mtime = 0
+        self.counts = Counter()
+        self.rollups = {period: {} for period in PERIODS}
+        self._dirty = False
+        self._saved_at = None
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            self.offset = saved["offset"]
+            self.size = saved["size"]
+            self.mtime = saved["mtime"]
+            self.counts = Counter(saved["counts"])
+            self.rollups = {period: saved["rollups"][period] for period in PERIODS}
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            pass
+
+    def save(self):
+        tmp_path = temp_path(self.path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "offset": self.offset,
+                "size": self.size,
+                "mtime": self.mtime,
+                "counts": self.counts,
+                "rollups": self.rollups,
+            }, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _changed(self):
+        self._dirty = True
+        if self._saved_at is None or time.monotonic() - self._saved_at >= self.SAVE_INTERVAL:
+            self.save()
+
+    def flush(self):
+        if self._dirty:
+            self.save()
+
+    def reset(self):
+        self.offset = self.size = self.mtime = 0
+        self.counts = Counter()
+        self.rollups = {period: {} for period in PERIODS}
+
+    def _count(self, record):
+        self.counts[record.diagnosis] += 1
+        for period in PERIODS:
+            key = bucket(record.date, period)
+            if key:
+                counts = self.rollups[period].setdefault(key, {})
+                counts[record.diagnosis] = counts.get(record.diagnosis, 0) + 1
+
+    def refresh(self):
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            if self.offset:
+                self.reset()
+                self._changed()
+            return self.counts
+
+        if (st.st_size, st.st_mtime_ns) == (self.size, self.mtime):
+            return self.counts
+
+        # a grown log is an append, a shrunk one was replaced: recount
+        if st.st_size < self.size:
+            self.reset()
+
+        # starts after the last complete record, so a half-written one is
+        # read again next time
+        for record, offset in read_records(self.log_path, self.offset):
+            self._count(record)
+            self.offset = offset
+        self.size = max(st.st_size, self.offset)
+        self.mtime = st.st_mtime_ns
+        self._changed()
+        return self.counts
+
+    def add(self, records, start, end, mtime):
+        # called right after our own append of records at [start, end)
+        if self.offset != start or self.size != start:
+            return
+        for record in records:
+            self._count(record)
+        self.offset = self.size = end
+        self.mtime = mtime
+        self._changed()
+
+class AppendLock:
+    # exclusive advisory lock shared by every process appending to a log;
+    # a separate lock file, as Windows locks are mandatory for readers
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:     # LK_LOCK gives up after 10 s
+                    pass
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+def write_all(fd, data):
+    # os.write may write less than asked (signals, full disk)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+class TextRecordLog:
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._lock = None
+        self._counts = None
+        # end offset of every record indexed so far, grown on demand by page()
+        self._ends = array("q")
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        # one locked O_APPEND write per batch
+        records = list(records)
+        if not records:
+            return
+        if self._fd is None:
+            flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+            self._fd = os.open(self.path, flags, 0o644)
+            self._lock = AppendLock(self.path + ".lock")
+        counts = self._log_counts()
+        counts.refresh()
+
+        data = "".join(format_record(record) for record in records).encode("utf-8")
+        with self._lock:
+            start = os.fstat(self._fd).st_size
+            write_all(self._fd, data)
+            mtime = os.fstat(self._fd).st_mtime_ns
+        # skipped by LogCounts if another process appended in between
+        counts.add(records, start, start + len(data), mtime)
+
+    def sync(self):
+        if self._fd is not None:
+            os.fsync(self._fd)
+        if self._counts is not None:
+            self._counts.flush()
+
+    def records(self):
+        for record, _ in self.read_since(None):
+            yield record
+
+    def read_since(self, checkpoint):
+        # checkpoint is the byte offset after the last record already seen
+        try:
+            yield from read_records(self.path, checkpoint or 0)
+        except FileNotFoundError:
+            return
+
+    def checkpoint_valid(self, checkpoint):
+        # False once the log was truncated or replaced by a shorter one
+        try:
+            return os.path.getsize(self.path) >= (checkpoint or 0)
+        except FileNotFoundError:
+            return not checkpoint
+
+    def _index_to(self, count):
+        # make sure the end offsets of the first `count` records are known
+        if self._ends and not self.checkpoint_valid(self._ends[-1]):
+            self._ends = array("q")
+        if len(self._ends) < count:
+            for _, end in self.read_since(self._ends[-1] if self._ends else None):
+                self._ends.append(end)
+                if len(self._ends) >= count:
+                    break
+        return len(self._ends) >= count
+
+    def page(self, start, limit):
+        # records [start, start + limit) by position, for the paged table
+        if not self._index_to(start):
+            return []
+        begin = self._ends[start - 1] if start else 0
+        rows = []
+        for record, end in islice(self.read_since(begin), limit):
+            if start + len(rows) == len(self._ends):
+                self._ends.append(end)
+            rows.append(record)
+        return rows
+
+    def records_at(self, positions):
+        # records at the given sorted positions
+        if not positions or not self._index_to(positions[-1] + 1):
+            return []
+        rows = []
+        for position in positions:
+            begin = self._ends[position - 1] if position else 0
+            rows.extend(record for record, _ in islice(self.read_since(begin), 1))
+        return rows
+
+    def _log_counts(self):
+        if self._counts is None:
+            self._counts = LogCounts(self.path)
+        return self._counts
+
+    def count(self):
+        return sum(self.diagnosis_counts().values())
+
+    def diagnosis_counts(self):
+        return Counter(self._log_counts().refresh())
+
+    def rollups(self, period, start=None, end=None):
+        counts = self._log_counts()
+        counts.refresh()
+        return select_buckets(counts.rollups[period], period, start, end)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._lock.close()
+        if self._counts is not None:
+            self._counts.flush()
+
+def open_records(path):
+    # .db/.sqlite files use the SQLite store, a directory or a .segments
+    # path the segmented log, anything else the text log
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        from record_store import SqliteRecordStore
+        return SqliteRecordStore(path)
+    if os.path.isdir(path) or path.rstrip("/\\").endswith(".segments"):
+        from segmented_log import SegmentedRecordLog
+        return SegmentedRecordLog(path)
+    return TextRecordLog(path)
@@ -0,0 +1,61 @@
+import hashlib
+import os
+from clips import Environment, CLIPSError
+from records import temp_path
+
+# Binary rule images (CLIPS bsave/bload). The first start compiles the
+# constructs and saves an image; later starts load the image instead of
+# parsing every construct again. The image name contains a digest of the
+# construct source, so editing a rule makes the old image unused.
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".clips_images")
+
+def source_digest(constructs):
+    return hashlib.sha256("".join(constructs).encode("utf-8")).hexdigest()
+
+def image_path(name, constructs):
+    return os.path.join(IMAGE_DIR, f"{name}-{source_digest(constructs)[:16]}.bin")
+
+def build(constructs):
+    env = Environment()
+    for construct in constructs:
+        env.build(construct)
+    return env
+
+def save_image(env, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # keep slot constraints in the image (and silence CLIPS' warning)
+    env.eval("(set-dynamic-constraint-checking TRUE)")
+    tmp_path = temp_path(path)
+    env.save(tmp_path, binary=True)
+    os.replace(tmp_path, path)
+
+def remove_stale_images(name, keep):
+    try:
+        entries = os.listdir(IMAGE_DIR)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.startswith(name + "-") and entry.endswith(".bin") and entry != os.path.basename(keep):
+            try:
+                os.remove(os.path.join(IMAGE_DIR, entry))
+            except OSError:
+                pass
+
+def load_or_build(name, constructs):
+    path = image_path(name, constructs)
+    if os.path.exists(path):
+        env = Environment()
+        try:
+            env.load(path, binary=True)
+            return env
+        except CLIPSError:
+            pass    # damaged or from another CLIPS version, rebuild below
+
+    env = build(constructs)
+    try:
+        save_image(env, path)
+        remove_stale_images(name, path)
+    except (OSError, CLIPSError):
+        pass        # read-only install, keep running from the compiled env
+    return env
@@ -0,0 +1,98 @@
+import os
+import sys
+import engine
+from records import temp_path
+
+# Precompiled answers for every combination of the selectable symptoms.
+# Bit i of a mask is set when CODES[i] is selected; table[mask] holds the
+# stage index into RESULTS. The file starts with the rule digest so an
+# edited rule base rebuilds the table on next load.
+
+CODES = tuple(engine.SYMPTOMS)
+BITS = {code: 1 << i for i, code in enumerate(CODES)}
+RESULTS = ("None", "P001", "P002", "P003")
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "diagnosis_table.bin")
+
+MAGIC = b"ALZT1"
+
+def symptoms_to_mask(symptoms):
+    mask = 0
+    for code in symptoms:
+        mask |= BITS[code]
+    return mask
+
+def mask_to_symptoms(mask):
+    return [code for code in CODES if mask & BITS[code]]
+
+def build_table():
+    masks = range(1 << len(CODES))
+    results = engine.diagnose_many(mask_to_symptoms(mask) for mask in masks)
+    return bytes(RESULTS.index(result) for result in results)
+
+def save_table(table, path=TABLE_PATH):
+    tmp_path = temp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + engine.rules_digest() + table)
+    os.replace(tmp_path, path)
+
+def read_table(path=TABLE_PATH):
+    # None when missing, damaged or built from other rules
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    header = MAGIC + engine.rules_digest()
+    table = data[len(header):]
+    if not data.startswith(header) or len(table) != 1 << len(CODES):
+        return None
+    return table
+
+def verify_table(table, env=None):
+    # compare every entry against a separate live CLIPS environment
+    env = env or engine.build_environment()
+    mismatches = []
+    for mask in range(1 << len(CODES)):
+        expected = engine.run_environment(env, mask_to_symptoms(mask))
+        if RESULTS[table[mask]] != expected:
+            mismatches.append((mask, RESULTS[table[mask]], expected))
+    return mismatches
+
+# the table of the rules it was loaded for; a rule reload loads another
+_table = None
+_table_digest = None
+
+def load_table():
+    global _table, _table_digest
+    digest = engine.rules_digest()
+    if digest != _table_digest:
+        table = read_table()
+        if table is None:
+            table = build_table()
+            save_table(table)
+        _table = table
+        _table_digest = digest
+    return _table
+
+def diagnose_fast(symptoms):
+    try:
+        mask = symptoms_to_mask(symptoms)
+    except KeyError:
+        # derived or unknown codes are not in the table
+        return engine.diagnose(symptoms)
+    return RESULTS[load_table()[mask]]
+
+if __name__ == "__main__":
+    # python rule_table.py [--rebuild]
+    if "--rebuild" in sys.argv:
+        table = build_table()
+        save_table(table)
+    else:
+        table = load_table()
+
+    mismatches = verify_table(table)
+    for mask, got, expected in mismatches[:20]:
+        print(f"mask {mask:05d} {mask_to_symptoms(mask)}: table {got}, CLIPS {expected}")
+    print(f"{len(table) - len(mismatches)}/{len(table)} entries match live CLIPS")
+    sys.exit(1 if mismatches else 0)
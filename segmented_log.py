@@ -0,0 +1,436 @@
+import argparse
+import bisect
+import json
+import os
+import re
+import struct
+import time
+import zlib
+from collections import Counter
+from io import BytesIO
+from records import AppendLock, TextRecordLog, bucket, parse_records, read_records, select_buckets, temp_path
+
+# Segmented record log: the text log format, split into a directory of
+# segments instead of one ever-growing file.
+#
+#   diagnosis_records.segments/
+#     segment-000001.log.gz     closed, gzip-compressed, with a summary
+#     segment-000002.log.gz
+#     segment-000003.log        the active segment, a plain TextRecordLog
+#
+# The active segment is closed once it reaches max_bytes or a record from
+# a new month (roll="month", or "day") comes in. Closing gzips it and
+# stores a summary in the gzip header's extra field: record count, first
+# and last date, per-diagnosis counts and per-day counts. The summary is
+# read with one small read, without inflating anything, so counts, trend
+# rollups and time-range reads use or skip closed segments whole and only
+# ever scan the active segment, which is bounded by max_bytes. The files
+# stay ordinary .gz files that zcat and gzip.open read.
+#
+# Several processes may append to one directory. Every append and every
+# roll-over holds the directory's append.lock, and a writer re-scans the
+# directory under it, so nobody writes to a segment that another process
+# is compressing or has already closed.
+#
+# Checkpoints (for read_since) are [segment, offset] with the offset into
+# the segment's uncompressed text, so they stay valid when it is closed.
+#
+#   ALZ_RECORDS=diagnosis_records.segments python main.py
+#   python segmented_log.py import diagnosis_records.txt diagnosis_records.segments
+#   python segmented_log.py stats diagnosis_records.segments
+#   python segmented_log.py range diagnosis_records.segments 2026-03-01 2026-03-31
+
+SEGMENT = re.compile(r"segment-(\d{6})\.log(\.gz)?$")
+SUMMARY_ID = b"AZ"      # gzip extra subfield holding the summary
+ROLL_KEYS = {"day": 10, "month": 7}
+
+def segment_name(number, closed):
+    return f"segment-{number:06d}.log" + (".gz" if closed else "")
+
+def summarize(data):
+    # summary of the complete records in a segment's text; records past
+    # the last complete one are not counted and not kept
+    counts = Counter()
+    days = {}
+    first = last = None
+    end = 0
+    for record, end in parse_records(BytesIO(data)):
+        counts[record.diagnosis] += 1
+        day = bucket(record.date, "day")
+        if day:
+            day_counts = days.setdefault(day, {})
+            day_counts[record.diagnosis] = day_counts.get(record.diagnosis, 0) + 1
+            first = record.date if first is None else min(first, record.date)
+            last = record.date if last is None else max(last, record.date)
+    return {
+        "count": sum(counts.values()),
+        "bytes": end,
+        "first": first,
+        "last": last,
+        "counts": dict(counts),
+        "days": days
+    }, end
+
+def write_segment(path, data, summary):
+    # one gzip member with FEXTRA set; written to a temp file and renamed,
+    # so a closed segment is either complete or not there
+    extra = json.dumps(summary, separators=(",", ":")).encode("utf-8")
+    if len(extra) > 0xFFFF - 4:
+        raise ValueError("segment summary too large")
+    field = SUMMARY_ID + struct.pack("<H", len(extra)) + extra
+    header = b"\x1f\x8b\x08\x04" + struct.pack("<I", int(time.time())) + b"\x00\xff"
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    tmp_path = temp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(header + struct.pack("<H", len(field)) + field)
+        f.write(compressor.compress(data) + compressor.flush())
+        f.write(struct.pack("<II", zlib.crc32(data), len(data) & 0xFFFFFFFF))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_summary(path):
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:3] != b"\x1f\x8b\x08" or not header[3] & 0x04:
+            raise ValueError(f"{path}: no segment summary")
+        (xlen,) = struct.unpack("<H", header[10:12])
+        extra = f.read(xlen)
+    pos = 0
+    while pos + 4 <= len(extra):
+        (length,) = struct.unpack("<H", extra[pos + 2:pos + 4])
+        if extra[pos:pos + 2] == SUMMARY_ID:
+            return json.loads(extra[pos + 4:pos + 4 + length])
+        pos += 4 + length
+    raise ValueError(f"{path}: no segment summary")
+
+def in_range(date, start, end):
+    # dates compare as text; an end of "2026-03-31" includes that whole day
+    return (not start or date >= start) and (not end or date[:len(end)] <= end)
+
+class SegmentedRecordLog:
+    def __init__(self, path, max_bytes=4 * 1024 * 1024, roll="month"):
+        if roll is not None and roll not in ROLL_KEYS:
+            raise ValueError(f"roll must be one of {tuple(ROLL_KEYS)} or None")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.roll = roll
+        os.makedirs(path, exist_ok=True)
+        self._closed = {}           # number -> summary
+        self._active_number = 1
+        self._active = None         # TextRecordLog of the active segment
+        self._active_key = None     # roll key of the active segment's records
+        self._cached = None         # (number, records) of the last closed segment read
+        self._lock = AppendLock(os.path.join(path, "append.lock"))
+        self._scan()
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, segment_name(number, number in self._closed))
+
+    def _scan(self):
+        # pick up segments closed by another writer (RecordWriter has its
+        # own instance)
+        closed, open_ = set(), set()
+        for name in os.listdir(self.path):
+            match = SEGMENT.match(name)
+            if match:
+                (closed if match.group(2) else open_).add(int(match.group(1)))
+
+        for number in closed - self._closed.keys():
+            self._closed[number] = read_summary(os.path.join(self.path, segment_name(number, True)))
+        for number in self._closed.keys() - closed:
+            del self._closed[number]
+
+        # a .log next to its .gz is left over from a close that could not
+        # delete it (e.g. still open on Windows)
+        for number in open_ & closed:
+            self._remove_log(number)
+        open_ -= closed
+
+        active = max(open_ | {max(closed, default=0) + 1})
+        if active != self._active_number:
+            if self._active is not None:
+                # closing flushes its counts, which must not outlive the segment
+                self._active.close()
+                if self._active_number in closed:
+                    self._remove_log(self._active_number)
+            self._active = None
+            self._active_key = None
+            self._active_number = active
+
+    def _remove_log(self, number):
+        log_path = os.path.join(self.path, segment_name(number, False))
+        for leftover in (log_path, log_path + ".counts.json", log_path + ".lock"):
+            try:
+                os.remove(leftover)
+            except OSError:
+                pass
+
+    def _active_log(self):
+        if self._active is None:
+            self._active = TextRecordLog(self._segment_path(self._active_number))
+        return self._active
+
+    def _roll_key(self, record):
+        if self.roll is None or not bucket(record.date, "day"):
+            return None
+        return record.date[:ROLL_KEYS[self.roll]]
+
+    def _current_key(self):
+        if self._active_key is None:
+            for record in self._active_log().page(0, 1):
+                self._active_key = self._roll_key(record)
+        return self._active_key
+
+    def _active_size(self):
+        try:
+            return os.path.getsize(self._segment_path(self._active_number))
+        except FileNotFoundError:
+            return 0
+
+    def close_segment(self):
+        # compress the active segment and start a new one; a no-op while
+        # the active segment is empty
+        with self._lock:
+            self._scan()
+            self._close_segment()
+
+    def _close_segment(self):
+        # with the lock held and the directory freshly scanned
+        log = self._active_log()
+        log.close()
+        log_path = self._segment_path(self._active_number)
+        try:
+            with open(log_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        summary, end = summarize(data)
+        if not summary["count"]:
+            return
+
+        number = self._active_number
+        write_segment(os.path.join(self.path, segment_name(number, True)), data[:end], summary)
+        self._closed[number] = summary
+        self._remove_log(number)
+        self._active = None
+        self._active_key = None
+        self._active_number = number + 1
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        # split the batch where a record needs a new segment; each run is
+        # one write to the active segment
+        records = list(records)
+        if not records:
+            return
+        with self._lock:
+            # another process may have closed the segment we last wrote to
+            self._scan()
+            i = 0
+            while i < len(records):
+                key = self._roll_key(records[i])
+                current = self._current_key()
+                if self._active_size() and (self._active_size() >= self.max_bytes
+                                            or (key and current and key != current)):
+                    self._close_segment()
+                    continue
+                j = i + 1
+                while j < len(records) and self._roll_key(records[j]) in (key, None):
+                    j += 1
+                self._active_log().append_many(records[i:j])
+                if self._active_key is None:
+                    self._active_key = key
+                i = j
+
+    def sync(self):
+        if self._active is not None:
+            self._active.sync()
+
+    def migrate_text_log(self, path, batch_size=10000):
+        # one-off import of a plain-text log, as SqliteRecordStore does
+        batch = []
+        for record, _ in read_records(path):
+            batch.append(record)
+            if len(batch) == batch_size:
+                self.append_many(batch)
+                batch = []
+        self.append_many(batch)
+        self.sync()
+
+    def records(self):
+        for record, _ in self.read_since(None):
+            yield record
+
+    def read_since(self, checkpoint):
+        self._scan()
+        first, offset = checkpoint or (min(self._closed, default=self._active_number), 0)
+        numbers = sorted(self._closed) + [self._active_number]
+        for number in numbers:
+            if number < first:
+                continue
+            try:
+                for record, end in read_records(self._segment_path(number), offset if number == first else 0):
+                    yield record, [number, end]
+            except FileNotFoundError:
+                if number in self._closed:
+                    raise
+
+    def read_range(self, start=None, end=None):
+        # records dated between start and end; closed segments outside the
+        # range are skipped on their summary alone
+        self._scan()
+        for number in sorted(self._closed):
+            summary = self._closed[number]
+            if summary["first"] is None or not (in_range(summary["last"], start, None)
+                                                and in_range(summary["first"], None, end)):
+                continue
+            for record, _ in read_records(self._segment_path(number)):
+                if in_range(record.date, start, end):
+                    yield record
+        for record in self._active_log().records():
+            if in_range(record.date, start, end):
+                yield record
+
+    def checkpoint_valid(self, checkpoint):
+        if not checkpoint:
+            return True
+        self._scan()
+        number, offset = checkpoint
+        if number in self._closed:
+            return offset <= self._closed[number]["bytes"]
+        return number == self._active_number and self._active_size() >= offset
+
+    def _segment_counts(self):
+        # (number, records) for every segment in order
+        counts = [(number, self._closed[number]["count"]) for number in sorted(self._closed)]
+        counts.append((self._active_number, self._active_log().count()))
+        return counts
+
+    def _closed_records(self, number):
+        if self._cached is None or self._cached[0] != number:
+            self._cached = (number, [record for record, _ in read_records(self._segment_path(number))])
+        return self._cached[1]
+
+    def _segment_rows(self, number, start, limit):
+        if number in self._closed:
+            return self._closed_records(number)[start:start + limit]
+        return self._active_log().page(start, limit)
+
+    def page(self, start, limit):
+        # records [start, start + limit) by position across all segments
+        self._scan()
+        rows = []
+        for number, count in self._segment_counts():
+            if start >= count:
+                start -= count
+                continue
+            rows.extend(self._segment_rows(number, start, limit - len(rows)))
+            start = 0
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def records_at(self, positions):
+        self._scan()
+        segments = self._segment_counts()
+        bases = [0]
+        for _, count in segments:
+            bases.append(bases[-1] + count)
+        rows = []
+        for position in positions:
+            i = bisect.bisect_right(bases, position) - 1
+            if i >= len(segments):
+                break
+            rows.extend(self._segment_rows(segments[i][0], position - bases[i], 1))
+        return rows
+
+    def count(self):
+        return sum(self.diagnosis_counts().values())
+
+    def diagnosis_counts(self):
+        self._scan()
+        counts = Counter()
+        for summary in self._closed.values():
+            counts.update(summary["counts"])
+        counts.update(self._active_log().diagnosis_counts())
+        return counts
+
+    def rollups(self, period, start=None, end=None):
+        self._scan()
+        if end:
+            end = bucket(end, "day")
+        combined = {}
+        for summary in self._closed.values():
+            if summary["first"] is None or (end and summary["first"][:10] > end) \
+                    or (start and summary["last"][:10] < bucket(start, period)):
+                continue
+            for day, day_counts in summary["days"].items():
+                key = bucket(day, period)
+                combined.setdefault(key, Counter()).update(day_counts)
+        for key, counts in self._active_log().rollups(period, start, end):
+            combined.setdefault(key, Counter()).update(counts)
+        return select_buckets(combined, period, start, end)
+
+    def close(self):
+        if self._active is not None:
+            self._active.close()
+        self._lock.close()
+
+def disk_usage(log):
+    # (bytes on disk, bytes of text) over all segments
+    on_disk = text = 0
+    for name in os.listdir(log.path):
+        if SEGMENT.match(name):
+            on_disk += os.path.getsize(os.path.join(log.path, name))
+    for summary in log._closed.values():
+        text += summary["bytes"]
+    return on_disk, text + log._active_size()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Segmented, compressed diagnosis record log.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="append a text log to a segmented log")
+    import_parser.add_argument("source")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--max-bytes", type=int, default=4 * 1024 * 1024)
+    import_parser.add_argument("--roll", choices=tuple(ROLL_KEYS) + ("none",), default="month")
+    stats_parser = commands.add_parser("stats", help="list the segments and their summaries")
+    stats_parser.add_argument("path")
+    range_parser = commands.add_parser("range", help="diagnosis counts between two dates")
+    range_parser.add_argument("path")
+    range_parser.add_argument("start", nargs="?")
+    range_parser.add_argument("end", nargs="?")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        log = SegmentedRecordLog(args.path, args.max_bytes, None if args.roll == "none" else args.roll)
+        log.migrate_text_log(args.source)
+        log.close()
+        print(f"{log.count()} records in {len(log._closed)} closed segment(s) and the active one")
+        return
+
+    log = SegmentedRecordLog(args.path)
+    if args.command == "stats":
+        for number, summary in sorted(log._closed.items()):
+            size = os.path.getsize(log._segment_path(number))
+            print(f"{segment_name(number, True)}  {summary['count']:8d} records  "
+                  f"{summary['first']} .. {summary['last']}  {size / 1e6:7.2f} MB "
+                  f"({summary['bytes'] / 1e6:.2f} MB text)")
+        print(f"{segment_name(log._active_number, False)}  {log._active_log().count():8d} records (active)")
+        on_disk, text = disk_usage(log)
+        print(f"{log.count()} records, {on_disk / 1e6:.2f} MB on disk for {text / 1e6:.2f} MB of text")
+        return
+
+    start = time.perf_counter()
+    counts = Counter(record.diagnosis for record in log.read_range(args.start, args.end))
+    elapsed = time.perf_counter() - start
+    for diagnosis, count in sorted(counts.items()):
+        print(f"{diagnosis:6s} {count:8d}")
+    print(f"{sum(counts.values())} records in {elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
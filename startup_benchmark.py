@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Startup benchmark for main.py. Each run starts a fresh interpreter,
+# records when the Tk root is created (everything before that is module
+# import) and when the first frame has been drawn, then closes the
+# window. Exits with status 1 when a median is over its budget.
+#
+#   python startup_benchmark.py [--runs 5] [--output startup.json]
+
+IMPORT_BUDGET_MS = 250
+FIRST_WINDOW_BUDGET_MS = 600
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r"""
+import json, runpy, sys, time
+start = time.perf_counter()
+import tkinter as tk
+
+timings = {}
+tk_init = tk.Tk.__init__
+
+def init(self, *args, **kwargs):
+    timings.setdefault("import_ms", (time.perf_counter() - start) * 1000)
+    tk_init(self, *args, **kwargs)
+
+def mainloop(self, n=0):
+    # draw the first frame, then leave instead of waiting for the user
+    self.update()
+    timings["first_window_ms"] = (time.perf_counter() - start) * 1000
+    self.update()       # let the deferred startup run too
+    timings["startup_done_ms"] = (time.perf_counter() - start) * 1000
+    self.destroy()
+
+tk.Tk.__init__ = init
+tk.Tk.mainloop = mainloop
+runpy.run_path("main.py", run_name="__main__")
+print(json.dumps(timings))
+"""
+
+def run_once():
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=HERE, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        # usually "no display name" when there is no X server
+        raise SystemExit("main.py failed to start:\n" + proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure main.py startup time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--first-window-budget", type=float, default=FIRST_WINDOW_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    runs = [run_once() for _ in range(args.runs)]
+    result = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    result["runs"] = runs
+
+    budgets = {"import_ms": args.import_budget, "first_window_ms": args.first_window_budget}
+    failed = False
+    for key in ("import_ms", "first_window_ms", "startup_done_ms"):
+        line = f"{key:18s} {result[key]:8.1f} ms"
+        if key in budgets:
+            over = result[key] > budgets[key]
+            failed = failed or over
+            line += f"  (budget {budgets[key]:.0f} ms{', OVER' if over else ''})"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+import bisect
+import json
+import os
+import re
+import struct
+import zlib
+from array import array
+from records import AppendLock, temp_path
+
+# Inverted index from symptom and diagnosis codes to records, for the
+# admin filter bar. Each code maps to a bitmap (a Python int) where bit i
+# is set when the i-th record in store order has that code, so AND / OR /
+# NOT are single big-int operations. On disk the bitmaps are stored
+# zlib-compressed next to the store as <store>.symidx.
+#
+# The file is one full block followed by delta blocks, one per refresh
+# that found new records, holding only the bits of those records; a
+# refresh appends one delta instead of rewriting the file, and after
+# MAX_DELTAS of them the file is rewritten as a single block. Every
+# SymptomIndex on the same file (RecordWriter keeps one up to date as it
+# appends, the admin page has its own) first reads the deltas the others
+# appended, and all writes happen under <store>.symidx.lock.
+#
+# Query syntax: codes combined with AND, OR, NOT and parentheses; codes
+# next to each other are ANDed, e.g.  G017 G018 NOT P003
+
+TOKEN = re.compile(r"\s*(\(|\)|[A-Za-z0-9_]+)")
+MAGIC = b"SYMIDX1\n"
+DELTA_MAGIC = b"SYMDLT1\n"
+
+def positions_to_bits(positions):
+    # sorted record positions -> bitmap
+    base = positions[0] & ~7
+    buf = bytearray((positions[-1] - base) // 8 + 1)
+    for pos in positions:
+        pos -= base
+        buf[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buf, "little") << base
+
+# set bit numbers of every byte value, for walking a bitmap
+BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+class FilterResult:
+    CHUNK = 8192    # bytes per chunk in the count table
+
+    def __init__(self, bits, size):
+        self.bits = bits
+        self.size = size
+        self.count = bits.bit_count()
+        self._bytes = None
+        self._before = None
+
+    def _prepare(self):
+        # how many matches come before each chunk, so a page deep in the
+        # result only walks one chunk
+        self._bytes = self.bits.to_bytes((self.size + 7) // 8 or 1, "little")
+        self._before = array("q", [0])
+        for start in range(0, len(self._bytes), self.CHUNK):
+            chunk = int.from_bytes(self._bytes[start:start + self.CHUNK], "little")
+            self._before.append(self._before[-1] + chunk.bit_count())
+
+    def positions(self, start, limit):
+        # record positions of matches [start, start + limit)
+        if start >= self.count or limit <= 0:
+            return []
+        if self._bytes is None:
+            self._prepare()
+
+        chunk = bisect.bisect_right(self._before, start) - 1
+        seen = self._before[chunk]
+        result = []
+        data = self._bytes
+        for i in range(chunk * self.CHUNK, len(data)):
+            byte = data[i]
+            if not byte:
+                continue
+            for bit in BYTE_BITS[byte]:
+                if seen >= start:
+                    result.append(i * 8 + bit)
+                    if len(result) == limit:
+                        return result
+                seen += 1
+        return result
+
+def encode_block(magic, header, bitmaps):
+    blobs = {
+        key: zlib.compress(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), 1)
+        for key, bits in bitmaps.items()
+    }
+    header = json.dumps(dict(header, bitmaps={key: len(blob) for key, blob in blobs.items()})).encode("utf-8")
+    return magic + struct.pack("<I", len(header)) + header + b"".join(blobs.values())
+
+def read_block(f, magic):
+    # (header, bitmaps) of the next block, None at the end of the file or
+    # at a block cut off by a crash
+    if f.read(len(magic)) != magic:
+        return None
+    try:
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len))
+        bitmaps = {}
+        for key, length in header["bitmaps"].items():
+            blob = f.read(length)
+            if len(blob) != length:
+                return None
+            bitmaps[key] = int.from_bytes(zlib.decompress(blob), "little")
+    except (ValueError, KeyError, struct.error, zlib.error):
+        return None
+    return header, bitmaps
+
+class SymptomIndex:
+    MAX_DELTAS = 256    # delta blocks before the file is rewritten as one
+
+    def __init__(self, store, path=None):
+        self.store = store
+        self.path = path or store.path + ".symidx"
+        self._lock = AppendLock(self.path + ".lock")
+        self._reset()
+        with self._lock:
+            self._load()
+
+    def _reset(self):
+        self.checkpoint = None
+        self.size = 0
+        self.bitmaps = {}
+        self._file = None       # (st_dev, st_ino) of the file the state came from
+        self._offset = 0        # bytes of it read so far
+        self._deltas = 0
+
+    def _load(self):
+        self._reset()
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            block = read_block(f, MAGIC)
+            if block is None:
+                return
+            header, self.bitmaps = block
+            self.checkpoint, self.size = header["checkpoint"], header["size"]
+            st = os.fstat(f.fileno())
+            self._file = (st.st_dev, st.st_ino)
+            self._offset = f.tell()
+            self._read_deltas(f)
+
+        if not self.store.checkpoint_valid(self.checkpoint):
+            self._reset()
+
+    def _read_deltas(self, f):
+        while True:
+            block = read_block(f, DELTA_MAGIC)
+            if block is None or block[0]["start"] != self.size:
+                return
+            header, bitmaps = block
+            for key, bits in bitmaps.items():
+                self.bitmaps[key] = self.bitmaps.get(key, 0) | bits << header["start"]
+            self.checkpoint, self.size = header["checkpoint"], header["size"]
+            self._offset = f.tell()
+            self._deltas += 1
+
+    def _catch_up(self):
+        # pick up the deltas other instances appended since the last look
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if (st.st_dev, st.st_ino) != self._file or st.st_size < self._offset:
+            self._load()
+        elif st.st_size > self._offset:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                self._read_deltas(f)
+
+    def save(self):
+        # the whole index as one block
+        tmp_path = temp_path(self.path)
+        with open(tmp_path, "wb") as f:
+            f.write(encode_block(MAGIC, {"checkpoint": self.checkpoint, "size": self.size}, self.bitmaps))
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self._file = (st.st_dev, st.st_ino)
+        self._offset = st.st_size
+        self._deltas = 0
+
+    def _save_delta(self, start, added):
+        # append the bits of records [start, size); rewrite the file instead
+        # when it has enough deltas or does not end where it was last read
+        try:
+            st = os.stat(self.path)
+            appendable = (st.st_dev, st.st_ino) == self._file and st.st_size == self._offset
+        except FileNotFoundError:
+            appendable = False
+        if not appendable or self._deltas >= self.MAX_DELTAS:
+            self.save()
+            return
+        header = {"start": start, "checkpoint": self.checkpoint, "size": self.size}
+        block = encode_block(DELTA_MAGIC, header, {
+            key: positions_to_bits([pos - start for pos in positions]) for key, positions in added.items()
+        })
+        with open(self.path, "ab") as f:
+            f.write(block)
+        self._offset += len(block)
+        self._deltas += 1
+
+    def refresh(self):
+        # index the records appended since the last refresh; True if the
+        # index changed, including through deltas saved by another instance
+        with self._lock:
+            before = (self.checkpoint, self.size)
+            self._catch_up()
+            if not self.store.checkpoint_valid(self.checkpoint):
+                self._reset()
+
+            start = self.size
+            added = {}
+            for record, checkpoint in self.store.read_since(self.checkpoint):
+                for code in record.symptoms:
+                    added.setdefault(code, []).append(self.size)
+                added.setdefault(record.diagnosis, []).append(self.size)
+                self.size += 1
+                self.checkpoint = checkpoint
+
+            for key, positions in added.items():
+                self.bitmaps[key] = self.bitmaps.get(key, 0) | positions_to_bits(positions)
+            if added:
+                self._save_delta(start, added)
+            return (self.checkpoint, self.size) != before
+
+    def close(self):
+        self._lock.close()
+
+    def query(self, text):
+        self.refresh()
+        return FilterResult(self._parse(text), self.size)
+
+    def _parse(self, text):
+        tokens = []
+        pos = 0
+        text = text.strip()
+        while pos < len(text):
+            match = TOKEN.match(text, pos)
+            if not match:
+                raise ValueError(f"unexpected character: {text[pos:].strip()[:1]!r}")
+            tokens.append(match.group(1))
+            pos = match.end()
+            while pos < len(text) and text[pos].isspace():
+                pos += 1
+        if not tokens:
+            raise ValueError("empty filter")
+
+        everything = (1 << self.size) - 1
+        keywords = {"AND", "OR", "NOT"}
+
+        def peek():
+            return tokens[0].upper() if tokens else None
+
+        def expr():
+            bits = term()
+            while peek() == "OR":
+                tokens.pop(0)
+                bits |= term()
+            return bits
+
+        def term():
+            bits = factor()
+            while tokens and peek() not in ("OR", ")"):
+                if peek() == "AND":
+                    tokens.pop(0)
+                bits &= factor()
+            return bits
+
+        def factor():
+            if not tokens:
+                raise ValueError("filter ends too early")
+            token = tokens.pop(0)
+            if token.upper() == "NOT":
+                return everything & ~factor()
+            if token == "(":
+                bits = expr()
+                if not tokens or tokens.pop(0) != ")":
+                    raise ValueError("missing )")
+                return bits
+            if token == ")" or token.upper() in keywords:
+                raise ValueError(f"unexpected {token!r}")
+            code = "None" if token.lower() == "none" else token.upper()
+            return self.bitmaps.get(code, 0)
+
+        bits = expr()
+        if tokens:
+            raise ValueError(f"unexpected {tokens[0]!r}")
+        return bits
+
+class FilteredRecords:
+    # store-like view of the records matching a query, for VirtualRecordTable
+
+    def __init__(self, index, text):
+        self.index = index
+        self.text = text
+        self.result = index.query(text)
+
+    def count(self):
+        if self.index.refresh():
+            self.result = self.index.query(self.text)
+        return self.result.count
+
+    def page(self, start, limit):
+        return self.index.store.records_at(self.result.positions(start, limit))
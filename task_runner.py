@@ -0,0 +1,115 @@
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs slow work (inference, record store reads, chart rendering) on a
+# worker thread and hands the result back on the Tk thread, so the window
+# keeps handling input while it runs.
+#
+#   tasks = TaskRunner(root, on_busy=show_busy)
+#   tasks.submit("chart", build_chart, counts, on_done=show_chart)
+#   tasks.cancel("chart")          # the user left the chart page
+#
+# Tasks belong to a group, normally one per page. Finished tasks are
+# picked up by polling with root.after, and on_done / on_error run on the
+# Tk thread. cancel(group) drops queued tasks before they start; a task
+# that is already running finishes, but its result is thrown away.
+# on_busy(group, True) is called once a group has had work outstanding
+# for BUSY_DELAY_MS, so quick tasks do not flash a busy indicator, and
+# on_busy(group, False) when the group is idle again.
+#
+# With the default single worker, tasks run one at a time in submit order,
+# which also keeps objects that are not thread-safe (a SQLite connection,
+# a CLIPS environment) on one thread as long as only tasks touch them.
+
+class Task:
+    def __init__(self, group, future, on_done, on_error):
+        self.group = group
+        self.future = future
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        self.future.cancel()
+
+class TaskRunner:
+    POLL_MS = 15
+    BUSY_DELAY_MS = 150
+
+    def __init__(self, root, workers=1, on_busy=None):
+        self.root = root
+        self.on_busy = on_busy
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ui-task")
+        self._tasks = {}        # group -> live tasks in submit order
+        self._busy_shown = set()
+
+    def submit(self, group, func, *args, on_done=None, on_error=None, replace=False):
+        # replace=True cancels what the group still has outstanding first
+        if replace:
+            self.cancel(group)
+        task = Task(group, self.executor.submit(func, *args), on_done, on_error)
+        live = self._tasks.setdefault(group, [])
+        live.append(task)
+        if len(live) == 1:
+            self.root.after(self.BUSY_DELAY_MS, self._show_busy, group)
+        self.root.after(self.POLL_MS, self._poll, task)
+        return task
+
+    def call(self, func, *args):
+        # run on the worker and wait, for setup and shutdown only
+        return self.executor.submit(func, *args).result()
+
+    def busy(self, group):
+        return group in self._tasks
+
+    def cancel(self, group):
+        for task in self._tasks.pop(group, ()):
+            task.cancel()
+        self._set_idle(group)
+
+    def shutdown(self, last=None, keep=()):
+        # cancel everything but the groups in `keep`, whose queued tasks
+        # still run (without their callbacks), then run `last` on the
+        # worker (e.g. to close what the tasks opened there) and stop it
+        for group in list(self._tasks):
+            if group not in keep:
+                self.cancel(group)
+        if last is not None:
+            self.call(last)
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def _show_busy(self, group):
+        if group in self._tasks and group not in self._busy_shown:
+            self._busy_shown.add(group)
+            if self.on_busy:
+                self.on_busy(group, True)
+
+    def _set_idle(self, group):
+        if group in self._busy_shown:
+            self._busy_shown.discard(group)
+            if self.on_busy:
+                self.on_busy(group, False)
+
+    def _poll(self, task):
+        if task.cancelled:
+            return
+        if not task.future.done():
+            self.root.after(self.POLL_MS, self._poll, task)
+            return
+
+        live = self._tasks.get(task.group, [])
+        live.remove(task)
+        if not live:
+            self._tasks.pop(task.group, None)
+            self._set_idle(task.group)
+
+        error = task.future.exception()
+        if error is None:
+            if task.on_done:
+                task.on_done(task.future.result())
+        elif task.on_error:
+            task.on_error(error)
+        else:
+            traceback.print_exception(error, file=sys.stderr)
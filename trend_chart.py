@@ -0,0 +1,51 @@
+import base64
+import io
+import threading
+from datetime import datetime, timedelta
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Trend chart for the admin page: diagnoses per day or per week from the
+# store's rollups. Like PieChartRenderer it keeps one Figure and one Agg
+# canvas and redraws them in place, so render_png() runs on the task
+# worker and the Tk side only loads the finished image.
+
+def fill_gaps(period, buckets, codes):
+    # (dates, {code: counts}) with days/weeks without records as zero
+    step = timedelta(days=7 if period == "week" else 1)
+    by_key = dict(buckets)
+    day = datetime.strptime(buckets[0][0], "%Y-%m-%d")
+    last = datetime.strptime(buckets[-1][0], "%Y-%m-%d")
+    dates, series = [], {code: [] for code in codes}
+    while day <= last:
+        counts = by_key.get(day.strftime("%Y-%m-%d"), {})
+        dates.append(day)
+        for code in series:
+            series[code].append(counts.get(code, 0))
+        day += step
+    return dates, series
+
+class TrendChartRenderer:
+    def __init__(self, size=(8, 5), dpi=100):
+        self.figure = Figure(figsize=size, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self._lock = threading.Lock()
+
+    def render_png(self, period, buckets, names, colors):
+        # base64 PNG, ready for tk.PhotoImage(data=...); buckets are the
+        # sorted (date, counts) pairs of store.rollups()
+        with self._lock:
+            dates, series = fill_gaps(period, buckets, names)
+            self.ax.clear()
+            for code, values in series.items():
+                self.ax.plot(dates, values, marker="o", markersize=3,
+                             color=colors[code], label=f"{names[code]} ({code})")
+            self.ax.set_title(f"Diagnoses per {period}")
+            self.ax.set_ylabel("Diagnoses")
+            self.ax.legend()
+            self.figure.autofmt_xdate()
+
+            buf = io.BytesIO()
+            self.canvas.print_png(buf)
+            return base64.b64encode(buf.getvalue()).decode("ascii")
@@ -0,0 +1,124 @@
+import time
+from collections import namedtuple
+import numpy as np
+import bitset_engine
+import engine
+import rule_table
+
+# What-if analysis: which symptoms would have to be added to the current
+# selection to change the diagnosis. The rule base is evaluated for all
+# 2^15 combinations of the selectable symptoms at once: every combination
+# is a row of an int64 fact array, each rule of the bitset engine is one
+# vectorized mask test, and the rules are applied until no row changes.
+# A query then only filters the supersets of the selection, so it runs
+# well under a millisecond.
+#
+#   python what_if.py G001 G002        # suggestions, plus a check against
+#                                      # the precompiled table
+
+# a stage other than the current one and the smallest sets of symptoms
+# that lead to it
+Suggestion = namedtuple("Suggestion", ["stage", "count", "additions"])
+
+MASKS = np.arange(1 << len(rule_table.CODES), dtype=np.int64)
+
+def popcounts(masks):
+    counts = np.zeros(len(masks), dtype=np.uint8)
+    for i in range(len(rule_table.CODES)):
+        counts += ((masks >> i) & 1).astype(np.uint8)
+    return counts
+
+POPCOUNTS = popcounts(MASKS)
+
+def stage_array(rule_base=None):
+    # index into rule_table.RESULTS of the diagnosis for every mask
+    rules = bitset_engine.BitsetRules(rule_base or engine.current_rules())
+    if len(rules.bits) > 63:
+        raise ValueError("too many facts for an int64 state")
+
+    state = np.zeros(len(MASKS), dtype=np.int64)
+    for i, code in enumerate(rule_table.CODES):
+        bit = rules.symptom_bits.get(code, 0)
+        if bit:
+            state |= np.where((MASKS >> i) & 1 == 1, bit, 0)
+
+    while True:
+        before = state.copy()
+        for _, mask, out in rules.rules:
+            state[(state & mask) == mask] |= out
+        if np.array_equal(state, before):
+            break
+
+    # least severe first, so a more severe diagnosis overwrites it
+    stages = np.zeros(len(MASKS), dtype=np.uint8)
+    for bit, stage in reversed(rules.stage_bits):
+        stages[(state & bit) != 0] = rule_table.RESULTS.index(stage)
+    return stages
+
+# stages of the rule base they were computed for, redone after a reload
+_stages = None
+_stages_rules = None
+
+def current_stages():
+    global _stages, _stages_rules
+    rule_base = engine.current_rules()
+    if _stages_rules is not rule_base:
+        _stages = stage_array(rule_base)
+        _stages_rules = rule_base
+    return _stages
+
+def what_if(symptoms, limit=3):
+    # (current stage, [Suggestion per other reachable stage]), fewest
+    # additions first; at most `limit` alternative sets per stage
+    stages = current_stages()
+    selected = rule_table.symptoms_to_mask(symptoms)
+    current = stages[selected]
+
+    supersets = MASKS[(MASKS & selected) == selected]
+    reached = stages[supersets]
+    added = POPCOUNTS[supersets] - POPCOUNTS[selected]
+
+    suggestions = []
+    for stage in np.unique(reached):
+        if stage == current:
+            continue
+        hits = reached == stage
+        fewest = added[hits].min()
+        best = supersets[hits & (added == fewest)][:limit]
+        suggestions.append(Suggestion(
+            rule_table.RESULTS[stage],
+            int(fewest),
+            [tuple(rule_table.mask_to_symptoms(int(mask) ^ selected)) for mask in best]
+        ))
+    suggestions.sort(key=lambda s: (s.count, s.stage))
+    return rule_table.RESULTS[current], suggestions
+
+def prepare():
+    # build the stage array and take numpy's first-call costs (about 15 ms)
+    # up front, e.g. on a worker thread at startup
+    what_if(())
+
+if __name__ == "__main__":
+    import sys
+
+    start = time.perf_counter()
+    stages = current_stages()
+    built = time.perf_counter() - start
+    table = np.frombuffer(rule_table.load_table(), dtype=np.uint8)
+    print(f"all {len(stages)} masks evaluated in {built * 1000:.1f} ms, "
+          f"{int((stages != table).sum())} differ from the rule table")
+
+    symptoms = sys.argv[1:]
+    start = time.perf_counter()
+    prepare()
+    print(f"first query {(time.perf_counter() - start) * 1000:.1f} ms")
+    times = []
+    for _ in range(100):
+        start = time.perf_counter()
+        current, suggestions = what_if(symptoms)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print(f"{symptoms or 'no symptoms'}: {current}  (median {times[50] * 1000:.3f} ms, "
+          f"max {times[-1] * 1000:.3f} ms over {len(times)} queries)")
+    for s in suggestions:
+        print(f"  {s.stage}: add {s.count} -", " | ".join(", ".join(a) for a in s.additions))